@@ -0,0 +1,149 @@
+# POD node animation tracks -> glTF animation channel data
+# POD matrices are column-major like glTF's, translation in elements 12-14.
+
+import numpy as np
+
+def gatherFrames(data, indices, size, numFrames):
+  # (frames, size) float32 array of one POD track. When the track has an
+  # index list, entry n is the float offset of frame n in the data. A
+  # scene without animation (numFrames 0) still gets its first frame.
+  values = np.frombuffer(data, dtype=np.float32)
+  if indices is not None and len(indices):
+    offsets = np.frombuffer(indices, dtype=np.uint32)[:max(numFrames, 1)].astype(np.int64)
+    return values[offsets[:, None] + np.arange(size)]
+  frames = min(len(values) // size, max(numFrames, 1))
+  return values[:frames * size].reshape(frames, size)
+
+def matricesToQuaternions(rotations):
+  # (n, 3, 3) rotation matrices (row, column) -> (n, 4) x, y, z, w.
+  # Every row gets the branch of Shepperd's method with the largest
+  # pivot, which keeps the division well conditioned.
+  r = rotations
+  trace = r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2]
+  pivots = np.stack((trace, r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]), axis=1)
+  branch = pivots.argmax(axis=1)
+  s = 2 * np.sqrt(np.maximum(1 + 2 * pivots.max(axis=1) - trace, 1e-12))
+  (d21, d02, d10) = (r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0], r[:, 1, 0] - r[:, 0, 1])
+  (s01, s02, s12) = (r[:, 0, 1] + r[:, 1, 0], r[:, 0, 2] + r[:, 2, 0], r[:, 1, 2] + r[:, 2, 1])
+  candidates = np.stack((
+    np.stack((d21, d02, d10, s * s / 4), axis=1),
+    np.stack((s * s / 4, s01, s02, d21), axis=1),
+    np.stack((s01, s * s / 4, s12, d02), axis=1),
+    np.stack((s02, s12, s * s / 4, d10), axis=1),
+  ), axis=1)
+  quaternions = candidates[np.arange(len(r)), branch] / s[:, None]
+  return quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+def alignQuaternions(quaternions, starts=(0,)):
+  # Flips quaternions into the hemisphere of the previous frame, so that
+  # interpolating between keys takes the short way. starts are the first
+  # rows of independent tracks stacked in one array.
+  flips = np.zeros(len(quaternions), dtype=np.int64)
+  flips[1:] = (quaternions[1:] * quaternions[:-1]).sum(axis=1) < 0
+  flips[list(starts)] = 0
+  parity = np.cumsum(flips)
+  bounds = np.append(np.asarray(starts, dtype=np.int64), len(quaternions))
+  parity -= np.repeat(parity[bounds[:-1]], np.diff(bounds))
+  return np.where((parity % 2 == 1)[:, None], -quaternions, quaternions)
+
+def decomposeMatrices(matrices):
+  # (n, 16) column-major affine matrices -> translations (n, 3), rotations
+  # (n, 4) and scales (n, 3). Shear is not representable and is dropped;
+  # a mirroring matrix gets a negative x scale.
+  columns = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+  translations = columns[:, 3, :3]
+  basis = columns[:, :3, :3]
+  scales = np.linalg.norm(basis, axis=2)
+  scales[np.linalg.det(basis) < 0, 0] *= -1
+  safe = np.where(scales == 0, 1, scales)
+  rotations = matricesToQuaternions((basis / safe[:, :, None]).transpose(0, 2, 1))
+  return (translations, rotations, scales)
+
+def slerp(a, b, t):
+  # row-wise spherical interpolation of unit quaternions, t is (n,)
+  dot = (a * b).sum(axis=1)
+  b = np.where((dot < 0)[:, None], -b, b)
+  dot = np.abs(dot).clip(0, 1)
+  theta = np.arccos(dot)
+  sin = np.sin(theta)
+  near = sin < 1e-6
+  sin = np.where(near, 1, sin)
+  wa = np.where(near, 1 - t, np.sin((1 - t) * theta) / sin)
+  wb = np.where(near, t, np.sin(t * theta) / sin)
+  out = wa[:, None] * a + wb[:, None] * b
+  return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+def reduceKeyframes(values, starts, tolerance, spherical=False):
+  # Keeps the keys of stacked tracks (rows starts[i]:starts[i + 1]) that
+  # linear interpolation (slerp when spherical) can't reproduce within
+  # tolerance of every original frame. Returns a mask of the kept rows.
+  # Each pass drops every other key of each run of removable keys, so
+  # the neighbours a removed key is checked against are kept. Only keys
+  # whose neighbours changed are checked again.
+  count = len(values)
+  bounds = np.append(np.asarray(starts, dtype=np.int64), count)
+  kept = np.ones(count, dtype=bool)
+  settled = np.zeros(count, dtype=bool)
+  settled[bounds[:-1]] = True
+  settled[bounds[1:] - 1] = True
+
+  while True:
+    keys = np.flatnonzero(kept)
+    candidates = np.flatnonzero(~settled[keys])
+    if not len(candidates):
+      return kept
+    previous = keys[candidates - 1]
+    following = keys[candidates + 1]
+
+    # every frame the two kept neighbours of a key would span without it
+    lengths = following - previous - 1
+    windowStarts = np.cumsum(lengths) - lengths
+    window = np.repeat(np.arange(len(candidates)), lengths)
+    frames = previous[window] + 1 + np.arange(int(lengths.sum())) - windowStarts[window]
+    t = (frames - previous[window]) / (following - previous)[window]
+    (a, b) = (values[previous[window]], values[following[window]])
+    if spherical:
+      interpolated = slerp(a, b, t)
+      actual = values[frames]
+      sign = np.where(((interpolated * actual).sum(axis=1) < 0)[:, None], -1, 1)
+      errors = np.abs(interpolated - sign * actual).max(axis=1)
+    else:
+      errors = np.abs(a + (b - a) * t[:, None] - values[frames]).max(axis=1)
+    removable = np.maximum.reduceat(errors, windowStarts) <= tolerance
+    settled[keys[candidates[~removable]]] = True
+
+    # position of each key inside its run of removable neighbours
+    adjacent = np.concatenate(([False], removable[:-1] & (candidates[1:] == candidates[:-1] + 1)))
+    runStarts = removable & ~adjacent
+    runIndex = np.arange(len(candidates)) - np.maximum.accumulate(np.where(runStarts, np.arange(len(candidates)), 0))
+    removed = candidates[removable & (runIndex % 2 == 0)]
+    kept[keys[removed]] = False
+    settled[keys[removed - 1]] = False
+    settled[keys[removed + 1]] = False
+    settled[bounds[:-1]] = True
+    settled[bounds[1:] - 1] = True
+
+def constantTracks(values, starts, tolerance):
+  # tracks whose every frame is within tolerance of their first frame
+  starts = np.asarray(starts, dtype=np.int64)
+  lengths = np.diff(np.append(starts, len(values)))
+  deviation = np.abs(values - np.repeat(values[starts], lengths, axis=0)).max(axis=1)
+  return np.maximum.reduceat(deviation, starts) <= tolerance
+
+def composeMatrices(translations, rotations, scales):
+  # (n, 4, 4) matrices (row, column) of translation * rotation * scale
+  (x, y, z, w) = np.asarray(rotations, dtype=np.float64).T
+  matrices = np.zeros((len(x), 4, 4))
+  matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+  matrices[:, 0, 1] = 2 * (x * y - z * w)
+  matrices[:, 0, 2] = 2 * (x * z + y * w)
+  matrices[:, 1, 0] = 2 * (x * y + z * w)
+  matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+  matrices[:, 1, 2] = 2 * (y * z - x * w)
+  matrices[:, 2, 0] = 2 * (x * z - y * w)
+  matrices[:, 2, 1] = 2 * (y * z + x * w)
+  matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+  matrices[:, :3, :3] *= np.asarray(scales, dtype=np.float64)[:, None, :]
+  matrices[:, :3, 3] = translations
+  matrices[:, 3, 3] = 1
+  return matrices
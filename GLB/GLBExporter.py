@@ -3,11 +3,48 @@
 
 import numpy as np
 from struct import pack
+import hashlib
 import json
+import os
+
+class GLBSourceChunk:
+  # Placeholder for BIN chunk data that is only produced while saving.
+  # Its size is known up front so the layout (offsets, JSON) can be planned
+  # first; the bytes are then streamed into the file one source at a time.
+  def __init__(self, nbytes):
+    self.nbytes = nbytes
+
+class GLBFileChunk(GLBSourceChunk):
+  def __init__(self, path):
+    super().__init__(os.path.getsize(path))
+    self.path = path
+
+  def writeTo(self, f):
+    copied = 0
+    with open(self.path, "rb") as src:
+      while block := src.read(1 << 20):
+        f.write(block)
+        copied += len(block)
+    if copied != self.nbytes:
+      raise IOError(f"{self.path} changed size while the GLB was being written")
 
 class GLBExporter:
-  def __init__(self):
-    self.data = bytes()
+  def __init__(self, deduplicate=True):
+    # BIN chunk contents are kept as a list of references (bytes, arrays,
+    # memoryviews of the POD) and only written out in save(), so adding
+    # data never re-copies what was added before.
+    self.chunks = []
+    self.byteLength = 0
+    # Identical payloads (mirrored parts, LOD copies...) are stored once:
+    # content digest -> [(offset, data), ...], bufferView key -> index
+    self.deduplicate = deduplicate
+    self.dataOffsets = {}
+    self.bufferViewIndices = {}
+    self.dedupedBytes = 0
+    self.dedupedBufferViews = 0
+    # EXT_meshopt_compression bufferViews without stored uncompressed data
+    # point into this (never written) fallback buffer instead
+    self.fallbackByteLength = 0
     self.asset = {"version": "2.0", "generator": f"PicelBoi (originally made by jaames) POD2GLB", "copyright": "2024 (c) Imagination Technologies (POD File Format), 2024 (c) PicelBoi, 2018 (c) jaames"}
     self.scene = 0
     self.scenes = [{
@@ -22,6 +59,16 @@ class GLBExporter:
     self.textures = []
     self.images = []
     self.samplers = []
+    self.animations = []
+    self.skins = []
+    self.extensionsUsed = []
+    self.extensionsRequired = []
+
+  def addExtension(self, name, required=False):
+    if name not in self.extensionsUsed:
+      self.extensionsUsed.append(name)
+    if required and name not in self.extensionsRequired:
+      self.extensionsRequired.append(name)
 
   def addRootNodeIndex(self, index):
     self.scenes[0]["nodes"].append(index)
@@ -43,26 +90,102 @@ class GLBExporter:
 
   def addSampler(self, sampler):
     self.samplers.append(sampler)
+
+  def addSkin(self, skin):
+    index = len(self.skins)
+    self.skins.append(skin)
+    return index
+
+  def addAnimation(self, animation):
+    index = len(self.animations)
+    self.animations.append(animation)
+    return index
   
+  def addPadding(self):
+    padding = (4 - self.byteLength % 4) % 4
+    if padding:
+      self.chunks.append(bytes(padding))
+      self.byteLength += padding
+
   def addData(self, data):
+    view = memoryview(data).cast("B")
+    if self.deduplicate:
+      digest = hashlib.blake2b(view, digest_size=16).digest()
+      candidates = self.dataOffsets.setdefault(digest, [])
+      for (offset, existing) in candidates:
+        # compare the bytes too, a digest match alone is not proof
+        if existing == view:
+          self.dedupedBytes += view.nbytes
+          return offset
+    # Keep every bufferView 4-byte aligned, as accessors require
+    self.addPadding()
     # Calculate the current offset
-    offset = len(self.data)
-    # Add the new data
-    self.data += data
+    offset = self.byteLength
+    # Add the new data (by reference, copied once when saving)
+    self.chunks.append(data)
+    self.byteLength += view.nbytes
+    if self.deduplicate:
+      candidates.append((offset, view))
+    return offset
+
+  def addSource(self, source):
+    self.addPadding()
+    offset = self.byteLength
+    self.chunks.append(source)
+    self.byteLength += source.nbytes
     return offset
+
+  def addFile(self, path):
+    # File contents are streamed into the BIN chunk by save(), never held in memory
+    return self.addSource(GLBFileChunk(path))
   
   def addBufferView(self, bufferView):
+    if self.deduplicate:
+      # addData already maps identical payloads to the same byte range,
+      # so an identical view over it can be shared as well
+      key = json.dumps(bufferView, sort_keys=True)
+      index = self.bufferViewIndices.get(key)
+      if index is not None:
+        self.dedupedBufferViews += 1
+        return index
+      self.bufferViewIndices[key] = len(self.bufferViews)
     index = len(self.bufferViews)
     self.bufferViews.append(bufferView)
     return index
   
+  def addFallbackData(self, nbytes):
+    offset = self.fallbackByteLength
+    self.fallbackByteLength += (nbytes + 3) & ~3
+    return offset
+
+  def addMeshoptBufferView(self, bufferView, data, encoded, byteStride, mode, count, fallback=True):
+    # bufferView: the usual properties minus buffer/byteOffset. Without a
+    # fallback only the compressed data is stored and the extension
+    # becomes required.
+    self.addExtension("EXT_meshopt_compression", required=not fallback)
+    if fallback:
+      bufferView = {"buffer": 0, "byteOffset": self.addData(data), **bufferView}
+    else:
+      bufferView = {"buffer": 1, "byteOffset": self.addFallbackData(memoryview(data).nbytes), **bufferView}
+    bufferView["extensions"] = {
+      "EXT_meshopt_compression": {
+        "buffer": 0,
+        "byteOffset": self.addData(encoded),
+        "byteLength": len(encoded),
+        "byteStride": byteStride,
+        "mode": mode,
+        "count": count
+      }
+    }
+    return self.addBufferView(bufferView)
+
   def addAccessor(self, accessor):
     index = len(self.accessors)
     self.accessors.append(accessor)
     return index
   
   def buildJSON(self):
-    return {
+    data = {
       "asset": self.asset,
       "scene": self.scene,
       "scenes": self.scenes,
@@ -76,24 +199,43 @@ class GLBExporter:
       "images": self.images,
       "samplers": self.samplers,
     }
+    if self.skins:
+      data["skins"] = self.skins
+    if self.animations:
+      data["animations"] = self.animations
+    if self.extensionsUsed:
+      data["extensionsUsed"] = self.extensionsUsed
+    if self.extensionsRequired:
+      data["extensionsRequired"] = self.extensionsRequired
+    return data
   
   def save(self, path):
     with open(path, "wb") as f:
       # pad binary data with null bytes
-      self.data += bytes((4 - len(self.data) % 4) % 4)
+      self.addPadding()
 
       self.buffers.append({
-        "byteLength": len(self.data)
+        "byteLength": self.byteLength
       })
+      if self.fallbackByteLength:
+        self.buffers.append({
+          "byteLength": self.fallbackByteLength,
+          "extensions": {"EXT_meshopt_compression": {"fallback": True}}
+        })
 
       json_data = json.dumps(self.buildJSON())
       # pad json data with spaces
       json_data += " " * (4 - len(json_data) % 4)
       # write fileheader
-      f.write(pack("<4sII", b'glTF', 2, len(json_data) + len(self.data) + 28))
+      f.write(pack("<4sII", b'glTF', 2, len(json_data) + self.byteLength + 28))
       # write json chunk
       f.write(pack("<I4s", len(json_data), b'JSON'))
       f.write(json_data.encode())
       # write data chunk
-      f.write(pack("<I4s", len(self.data), b'BIN\x00'))
-      f.write(self.data)
+      f.write(pack("<I4s", self.byteLength, b'BIN\x00'))
+      # stream every chunk in layout order, no intermediate concatenation
+      for chunk in self.chunks:
+        if isinstance(chunk, GLBSourceChunk):
+          chunk.writeTo(f)
+        else:
+          f.write(chunk)
@@ -0,0 +1,236 @@
+# meshopt vertex/index codecs for EXT_meshopt_compression
+# spec: https://github.com/KhronosGroup/glTF/blob/main/extensions/2.0/Vendor/EXT_meshopt_compression/README.md
+# Bitstreams match meshoptimizer's encoders (vertex codec version 0, index
+# codec version 1), so any conforming decoder can read them.
+
+import numpy as np
+
+vertexHeader = 0xa0
+vertexBlockSizeBytes = 8192
+vertexBlockMaxSize = 256
+byteGroupSize = 16
+tailMaxSize = 32
+
+indexHeader = 0xe1
+triangleIndexOrder = ((0, 1, 2), (1, 2, 0), (2, 0, 1))
+# static codeaux table from meshoptimizer, built from symbol frequencies
+codeAuxEncodingTable = bytes((
+  0x00, 0x76, 0x87, 0x56, 0x67, 0x78, 0xa9, 0x86, 0x65, 0x89, 0x68, 0x98, 0x01, 0x69,
+  0x00, 0x00,
+))
+codeAuxIndices = {value: index for (index, value) in reversed(list(enumerate(codeAuxEncodingTable[:14])))}
+
+def vertexBlockSize(stride):
+  return min((vertexBlockSizeBytes // stride) & ~(byteGroupSize - 1), vertexBlockMaxSize)
+
+def encodeVertexBlock(block, last):
+  # Byte k of every vertex forms one stream of zigzagged deltas, which is
+  # split into groups of 16 stored with 0, 2, 4 or 8 bits per value.
+  (count, stride) = block.shape
+  aligned = (count + byteGroupSize - 1) & ~(byteGroupSize - 1)
+  previous = np.vstack((last[None], block[:-1]))
+  delta = block - previous
+  zigzag = (delta << 1) ^ (delta.view(np.int8) >> 7).view(np.uint8)
+
+  values = np.zeros((stride, aligned), dtype=np.uint8)
+  values[:, :count] = zigzag.T
+  numGroups = aligned // byteGroupSize
+  groups = values.reshape(stride, numGroups, byteGroupSize)
+
+  # same choice as meshoptimizer: 8 bits unless a smaller encoding wins
+  over2 = groups >= 3
+  over4 = groups >= 15
+  sizes = np.stack((
+    np.full((stride, numGroups), byteGroupSize),
+    np.where(groups.any(axis=2), byteGroupSize + 1, 0),
+    byteGroupSize * 2 // 8 + over2.sum(axis=2),
+    byteGroupSize * 4 // 8 + over4.sum(axis=2),
+  ))
+  bitsLog2 = np.array((3, 0, 1, 2), dtype=np.uint8)[sizes.argmin(axis=0)]
+  lengths = sizes.min(axis=0)
+
+  # header: 2 bits per group, first group in the lowest bits
+  headerSize = (numGroups + 3) // 4
+  headerBits = np.zeros((stride, headerSize * 4), dtype=np.uint8)
+  headerBits[:, :numGroups] = bitsLog2
+  header = (headerBits.reshape(stride, headerSize, 4) << np.array((0, 2, 4, 6), dtype=np.uint8)).sum(axis=2, dtype=np.uint8)
+
+  # Packed values (first value in the highest bits), then the full byte of
+  # every value that did not fit, in order.
+  rows = np.zeros((stride, numGroups + 1, 24), dtype=np.uint8)
+  rowLengths = np.zeros((stride, numGroups + 1), dtype=np.int64)
+  rows[:, 0, :headerSize] = header
+  rowLengths[:, 0] = headerSize
+
+  packed2 = np.minimum(groups, 3).reshape(stride, numGroups, 4, 4)
+  packed2 = (packed2[..., 0] << 6) | (packed2[..., 1] << 4) | (packed2[..., 2] << 2) | packed2[..., 3]
+  extra2 = np.take_along_axis(groups, np.argsort(~over2, axis=2, kind="stable"), axis=2)
+  packed4 = np.minimum(groups, 15).reshape(stride, numGroups, 8, 2)
+  packed4 = (packed4[..., 0] << 4) | packed4[..., 1]
+  extra4 = np.take_along_axis(groups, np.argsort(~over4, axis=2, kind="stable"), axis=2)
+
+  data = rows[:, 1:]
+  mode = bitsLog2[..., None]
+  data[..., :16] = np.where(mode == 3, groups, 0)
+  data[..., :4] = np.where(mode == 1, packed2, data[..., :4])
+  data[..., 4:20] = np.where(mode == 1, extra2, data[..., 4:20])
+  data[..., :8] = np.where(mode == 2, packed4, data[..., :8])
+  data[..., 8:24] = np.where(mode == 2, extra4, data[..., 8:24])
+  rowLengths[:, 1:] = lengths
+
+  return rows[np.arange(24) < rowLengths[..., None]].tobytes()
+
+def encodeVertexBuffer(data, count, stride):
+  # mode ATTRIBUTES. stride must be a multiple of 4, at most 256.
+  if stride % 4 or not 0 < stride <= 256:
+    raise ValueError(f"meshopt vertex codec cannot encode a stride of {stride}")
+  vertices = np.frombuffer(data, dtype=np.uint8, count=count * stride).reshape(count, stride)
+  first = vertices[0] if count else np.zeros(stride, dtype=np.uint8)
+
+  out = [bytes((vertexHeader,))]
+  last = first
+  blockSize = vertexBlockSize(stride)
+  for start in range(0, count, blockSize):
+    block = vertices[start:start + blockSize]
+    out.append(encodeVertexBlock(block, last))
+    last = block[-1]
+  # the first vertex again, padded to 32 bytes, as the decoder's baseline
+  out.append(bytes(max(tailMaxSize - stride, 0)))
+  out.append(first.tobytes())
+  return b"".join(out)
+
+def encodeIndexBuffer(indices):
+  # Mode TRIANGLES. Triangles are coded against FIFOs of recent edges and
+  # vertices; this is inherently sequential, so it is a plain loop.
+  indices = [int(i) for i in indices]
+  if len(indices) % 3:
+    raise ValueError("meshopt index codec needs a triangle list")
+  code = bytearray()
+  data = bytearray()
+  edgeFifo = [(-1, -1)] * 16
+  vertexFifo = [-1] * 16
+  edgeOffset = 0
+  vertexOffset = 0
+  nextIndex = 0
+  last = 0
+  fecMax = 13
+
+  def encodeIndex(index, last):
+    # zigzagged delta from the last free index as a varint
+    delta = (index - last) & 0xffffffff
+    value = ((delta << 1) & 0xffffffff) ^ (0xffffffff if delta & 0x80000000 else 0)
+    while True:
+      data.append((value & 127) | (128 if value > 127 else 0))
+      value >>= 7
+      if not value:
+        break
+
+  def findVertex(v):
+    for i in range(16):
+      if vertexFifo[(vertexOffset - 1 - i) & 15] == v:
+        return i
+    return -1
+
+  for i in range(0, len(indices), 3):
+    (i0, i1, i2) = indices[i:i + 3]
+
+    edge = -1
+    for j in range(15):
+      (e0, e1) = edgeFifo[(edgeOffset - 1 - j) & 15]
+      if e0 == i0 and e1 == i1:
+        edge = (j, 0)
+      elif e0 == i1 and e1 == i2:
+        edge = (j, 1)
+      elif e0 == i2 and e1 == i0:
+        edge = (j, 2)
+      else:
+        continue
+      break
+
+    if edge != -1:
+      (fe, rotation) = edge
+      (a, b, c) = [indices[i + k] for k in triangleIndexOrder[rotation]]
+      fc = findVertex(c)
+      if 1 <= fc < fecMax:
+        fec = fc
+      elif c == nextIndex:
+        fec = 0
+        nextIndex += 1
+      else:
+        fec = 15
+        # strip-like sequences: last - 1 and last + 1
+        if c + 1 == last:
+          fec = 13
+          last = c
+        elif c == last + 1:
+          fec = 14
+          last = c
+      code.append((fe << 4) | fec)
+      if fec == 15:
+        encodeIndex(c, last)
+        last = c
+      if fec == 0 or fec >= fecMax:
+        vertexFifo[vertexOffset] = c
+        vertexOffset = (vertexOffset + 1) & 15
+      edgeFifo[edgeOffset] = (c, b)
+      edgeFifo[(edgeOffset + 1) & 15] = (a, c)
+      edgeOffset = (edgeOffset + 2) & 15
+      continue
+
+    rotation = 1 if i1 == nextIndex else 2 if i2 == nextIndex else 0
+    (a, b, c) = [indices[i + k] for k in triangleIndexOrder[rotation]]
+    reset = False
+    if a == 0 and b == 1 and c == 2 and nextIndex > 0:
+      # restart code, so nextIndex does not get stuck after index 0 is reused
+      reset = True
+      nextIndex = 0
+      vertexFifo = [-1] * 16
+    fb = findVertex(b)
+    fc = findVertex(c)
+    if a == nextIndex:
+      fea = 0
+      nextIndex += 1
+    else:
+      fea = 15
+    if 0 <= fb < 14:
+      feb = fb + 1
+    elif b == nextIndex:
+      feb = 0
+      nextIndex += 1
+    else:
+      feb = 15
+    if 0 <= fc < 14:
+      fec = fc + 1
+    elif c == nextIndex:
+      fec = 0
+      nextIndex += 1
+    else:
+      fec = 15
+
+    codeAux = (feb << 4) | fec
+    codeAuxIndex = codeAuxIndices.get(codeAux, -1)
+    if fea == 0 and codeAuxIndex >= 0 and not reset:
+      code.append(0xf0 | codeAuxIndex)
+    else:
+      code.append(0xf0 | 14 | fea)
+      data.append(codeAux)
+    if fea == 15:
+      encodeIndex(a, last)
+      last = a
+    if feb == 15:
+      encodeIndex(b, last)
+      last = b
+    if fec == 15:
+      encodeIndex(c, last)
+      last = c
+    for (v, fe) in ((a, fea), (b, feb), (c, fec)):
+      if fe == 0 or fe == 15:
+        vertexFifo[vertexOffset] = v
+        vertexOffset = (vertexOffset + 1) & 15
+    edgeFifo[edgeOffset] = (b, a)
+    edgeFifo[(edgeOffset + 1) & 15] = (c, b)
+    edgeFifo[(edgeOffset + 2) & 15] = (a, c)
+    edgeOffset = (edgeOffset + 3) & 15
+
+  # the codeaux table doubles as the padding the decoder relies on
+  return bytes((indexHeader,)) + bytes(code) + bytes(data) + codeAuxEncodingTable
@@ -0,0 +1,96 @@
+# index/vertex buffer reordering for the GPU's post-transform vertex cache
+# tipsify: Sander, Nehab, Barczak - "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw" (2007)
+
+import numpy as np
+
+def simulateCache(indices, cacheSize=16):
+  # (ACMR, ATVR): transformed vertices per triangle / per unique vertex,
+  # for a FIFO cache of cacheSize entries
+  cache = [-1] * cacheSize
+  cached = set()
+  head = 0
+  misses = 0
+  for v in indices.tolist():
+    if v in cached:
+      continue
+    misses += 1
+    cached.discard(cache[head])
+    cache[head] = v
+    cached.add(v)
+    head = (head + 1) % cacheSize
+  numTriangles = len(indices) // 3
+  numVertices = len(np.unique(indices))
+  return (misses / max(numTriangles, 1), misses / max(numVertices, 1))
+
+def optimizeVertexCache(indices, numVertices, cacheSize=16):
+  # Tipsify: fan out from a vertex, emitting all its remaining triangles,
+  # then continue with the most recently used vertex that would still be
+  # in the cache, or a dead-end vertex when there is none.
+  triangles = indices.reshape(-1, 3)
+  numTriangles = len(triangles)
+  flat = triangles.ravel()
+  live = np.bincount(flat, minlength=numVertices).tolist()
+  offsets = np.concatenate(([0], np.cumsum(live))).tolist()
+  adjacency = (np.argsort(flat, kind="stable") // 3).tolist()
+  triangleList = triangles.tolist()
+
+  cacheTime = [0] * numVertices
+  emitted = [False] * numTriangles
+  deadEnd = []
+  order = []
+  time = cacheSize + 1
+  cursor = 0
+  fanning = int(flat[0]) if numTriangles else -1
+
+  while fanning >= 0:
+    candidates = []
+    for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+      if emitted[t]:
+        continue
+      emitted[t] = True
+      order.append(t)
+      for v in triangleList[t]:
+        deadEnd.append(v)
+        candidates.append(v)
+        live[v] -= 1
+        if time - cacheTime[v] > cacheSize:
+          cacheTime[v] = time
+          time += 1
+
+    # best candidate: still has triangles and stays cached the longest
+    fanning = -1
+    best = -1
+    for v in candidates:
+      if live[v] > 0:
+        priority = 0
+        if time - cacheTime[v] + 2 * live[v] <= cacheSize:
+          priority = time - cacheTime[v]
+        if priority > best:
+          best = priority
+          fanning = v
+
+    if fanning < 0:
+      while deadEnd:
+        v = deadEnd.pop()
+        if live[v] > 0:
+          fanning = v
+          break
+    if fanning < 0:
+      while cursor < numVertices:
+        if live[cursor] > 0:
+          fanning = cursor
+          break
+        cursor += 1
+
+  return triangles[np.array(order, dtype=np.int64)].ravel() if order else indices.copy()
+
+def optimizeVertexFetch(indices, numVertices):
+  # Renumbers vertices in order of first use. Returns the new indices and
+  # the old index of every new vertex; unused vertices go last.
+  (used, first) = np.unique(indices, return_index=True)
+  used = used[np.argsort(first, kind="stable")]
+  unused = np.setdiff1d(np.arange(numVertices), used, assume_unique=True)
+  newToOld = np.concatenate((used, unused)).astype(np.int64)
+  oldToNew = np.empty(numVertices, dtype=np.int64)
+  oldToNew[newToOld] = np.arange(numVertices)
+  return (oldToNew[indices].astype(indices.dtype), newToOld)
@@ -0,0 +1,52 @@
+# vertex attribute quantization for KHR_mesh_quantization
+# spec: https://github.com/KhronosGroup/glTF/blob/main/extensions/2.0/Khronos/KHR_mesh_quantization/README.md
+
+import numpy as np
+
+# glTF componentType -> numpy dtype
+componentDtypes = {
+  5120: np.int8,
+  5121: np.uint8,
+  5122: np.int16,
+  5123: np.uint16,
+  5125: np.uint32,
+  5126: np.float32,
+}
+dtypeComponentTypes = {np.dtype(dtype): componentType for (componentType, dtype) in componentDtypes.items()}
+
+def quantizePositions(positions, bounds=None):
+  # int16 around the bounding box center (bounds, if already known). The
+  # dequantization (scale, then translation) has to be applied by the node
+  # that references the mesh.
+  positions = positions.astype(np.float64)
+  (low, high) = bounds or (positions.min(axis=0), positions.max(axis=0))
+  (low, high) = (np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64))
+  translation = (low + high) / 2
+  scale = (high - low) / 2 / 32767
+  scale[scale == 0] = 1
+  quantized = np.rint((positions - translation) / scale).clip(-32767, 32767).astype(np.int16)
+  error = np.abs(quantized * scale + translation - positions).max()
+  return (quantized, translation, scale, error)
+
+def quantizeNormalized(values, dtype):
+  # normalized integers: [-1, 1] for signed types, [0, 1] for unsigned ones
+  info = np.iinfo(dtype)
+  values = values.astype(np.float64)
+  low = -1 if info.min < 0 else 0
+  quantized = np.rint(values.clip(low, 1) * info.max).astype(dtype)
+  error = np.abs(np.maximum(quantized / info.max, -1) - values).max()
+  return (quantized, error)
+
+def interleave(columns, numVertices):
+  # Packs (numVertices, n) arrays into one vertex buffer. Every element
+  # starts on a 4 byte boundary, as glTF requires for vertex attributes.
+  offsets = []
+  stride = 0
+  for column in columns:
+    offsets.append(stride)
+    stride += (column.dtype.itemsize * column.shape[1] + 3) & ~3
+  out = np.zeros((numVertices, stride), dtype=np.uint8)
+  for (column, offset) in zip(columns, offsets):
+    size = column.dtype.itemsize * column.shape[1]
+    out[:, offset:offset + size] = np.ascontiguousarray(column).view(np.uint8).reshape(numVertices, size)
+  return (out, stride, offsets)
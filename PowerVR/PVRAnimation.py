@@ -1,10 +1,12 @@
+from PowerVR.PVRDeferred import PVRDeferred
+
 class EPVRAnimation:
   eHasPositionAnimation = 0x01
   eHasRotationAnimation = 0x02
   eHasScaleAnimation =    0x04
   eHasMatrixAnimation =   0x08
 
-class PVRAnimation:
+class PVRAnimation(PVRDeferred):
   def __init__(self):
     self.flags = 0
     self.numFrames = 0
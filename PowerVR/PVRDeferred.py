@@ -0,0 +1,20 @@
+class PVRDeferred:
+  # Base for scene objects whose payloads can be loaded on demand.
+  # Attributes registered with Defer() are removed from the instance and
+  # fetched (then cached) the first time they are looked up.
+
+  def Defer(self, name, fetch):
+    self.__dict__.setdefault("deferred", {})[name] = fetch
+    self.__dict__.pop(name, None)
+
+  def IsDeferred(self, name):
+    return name in self.__dict__.get("deferred", ())
+
+  def __getattr__(self, name):
+    # only reached when normal attribute lookup fails
+    deferred = self.__dict__.get("deferred")
+    if not deferred or name not in deferred:
+      raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    value = deferred.pop(name)()
+    setattr(self, name, value)
+    return value
@@ -1,4 +1,6 @@
 
+from PowerVR.PVRDeferred import PVRDeferred
+
 class EPVRMaterial:
   class BlendFunction:
     eZERO                   = 0
@@ -28,7 +30,7 @@ class EPVRMaterial:
     eSUBTRACT         = 0x800A
     eREVERSE_SUBTRACT = 0x800B
 
-class PVRMaterial:
+class PVRMaterial(PVRDeferred):
   def __init__(self):
     self.name = ""
     self.diffuseTextureIndex        = -1
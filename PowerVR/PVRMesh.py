@@ -1,4 +1,5 @@
 from PowerVR.EPOD import *
+from PowerVR.PVRDeferred import PVRDeferred
 
 class EPVRMesh:
   eTriangleList          = 0
@@ -34,7 +35,30 @@ class EPVRMesh:
     e16Bit = 3
     e32Bit = 17
 
-class PVRMesh:
+  # numpy dtype and components per vertex of the raw element data. Packed
+  # colours are viewed as their 4 bytes, DEC3N as the packed 32-bit value.
+  dataTypeFormats = {
+    VertexData.eFloat:             ("<f4", None),
+    VertexData.eInt:               ("<i4", None),
+    VertexData.eUnsignedShort:     ("<u2", None),
+    VertexData.eRGBA:              ("u1", 4),
+    VertexData.eARGB:              ("u1", 4),
+    VertexData.eD3DCOLOR:          ("u1", 4),
+    VertexData.eUBYTE4:            ("u1", 4),
+    VertexData.eDEC3N:             ("<u4", 1),
+    VertexData.eFixed16_16:        ("<i4", None),
+    VertexData.eUnsignedByte:      ("u1", None),
+    VertexData.eShort:             ("<i2", None),
+    VertexData.eShortNorm:         ("<i2", None),
+    VertexData.eByte:              ("i1", None),
+    VertexData.eByteNorm:          ("i1", None),
+    VertexData.eUnsignedByteNorm:  ("u1", None),
+    VertexData.eUnsignedShortNorm: ("<u2", None),
+    VertexData.eUnsignedInt:       ("<u4", None),
+    VertexData.eABGR:              ("u1", 4),
+  }
+
+class PVRMesh(PVRDeferred):
   def __init__(self):
     self.unpackMatrix = []
     self.vertexElementData = []
@@ -49,6 +73,8 @@ class PVRMesh:
 			"stripLengths": None,
 		  "primitiveType": EPVRMesh.eIndexedTriangleList
     }
+    self.attributeViews = {}
+    self.attributeStats = None
     self.boneBatches = {
 			"boneMax": 0,
 			"count": 0,
@@ -71,6 +97,12 @@ class PVRMesh:
     self.primitiveData["numFaces"] = len(data) // 3 if len(data) > 0 else 0
     return EPODErrorCodes.eNoError
 
+  def AddDeferredFaces(self, fetch, type, numIndices):
+    # faces are only read from the file once mesh.faces is first touched
+    self.primitiveData["numFaces"] = numIndices // 3
+    self.Defer("faces", lambda: {"indexType": type, "data": fetch()})
+    return EPODErrorCodes.eNoError
+
   def AddElement(self, semantic, type, numComponents, stride, offset, dataIndex):
     if semantic in self.vertexElements:
       return EPODErrorCodes.eKeyAlreadyExists
@@ -82,4 +114,76 @@ class PVRMesh:
       "offset": offset,
       "dataIndex": dataIndex,
     }
-    return EPODErrorCodes.eNoError
\ No newline at end of file
+    return EPODErrorCodes.eNoError
+
+  def attribute(self, name):
+    # (numVertices, numComponents) numpy view of a vertex element straight
+    # on its data buffer, no copy. Views are cached until the element's
+    # buffer is replaced.
+    import numpy as np
+
+    element = self.vertexElements[name]
+    data = self.vertexElementData[element["dataIndex"]]
+    cached = self.attributeViews.get(name)
+    if cached is not None and cached[0] is data:
+      return cached[1]
+
+    if element["dataType"] not in EPVRMesh.dataTypeFormats:
+      raise ValueError(f"Unsupported vertex data type {element['dataType']} of {name}")
+    (format, numComponents) = EPVRMesh.dataTypeFormats[element["dataType"]]
+    dtype = np.dtype(format)
+    numComponents = numComponents or element["numComponents"]
+    size = dtype.itemsize * numComponents
+    # non-interleaved elements may leave the stride at 0 (tightly packed)
+    stride = element["stride"] or size
+    numVertices = self.primitiveData["numVertices"]
+    nbytes = memoryview(data).nbytes
+    if numVertices and element["offset"] + (numVertices - 1) * stride + size > nbytes:
+      raise ValueError(f"{name} needs {numVertices} vertices of {stride} bytes, data has {nbytes} bytes")
+
+    view = np.ndarray((numVertices, numComponents), dtype=dtype, buffer=data,
+                      offset=element["offset"] if numVertices else 0, strides=(stride, dtype.itemsize))
+    self.attributeViews[name] = (data, view)
+    return view
+
+  def attributeBounds(self):
+    # {name: (min, max)} per component of every vertex element numpy can
+    # view. Elements sharing a buffer and a data type are reduced together
+    # in one pass over the buffer. Cached until a buffer is replaced.
+    import numpy as np
+
+    buffers = tuple(self.vertexElementData)
+    if self.attributeStats is not None and len(self.attributeStats[0]) == len(buffers) \
+        and all(a is b for (a, b) in zip(self.attributeStats[0], buffers)):
+      return self.attributeStats[1]
+
+    numVertices = self.primitiveData["numVertices"]
+    groups = {}
+    for (name, element) in self.vertexElements.items():
+      if element["dataType"] in EPVRMesh.dataTypeFormats and 0 <= element["dataIndex"] < len(buffers):
+        format = EPVRMesh.dataTypeFormats[element["dataType"]][0]
+        groups.setdefault((element["dataIndex"], format), []).append(name)
+
+    bounds = {}
+    for ((dataIndex, format), names) in groups.items() if numVertices else ():
+      views = [self.attribute(name) for name in names]
+      itemsize = views[0].itemsize
+      stride = views[0].strides[0]
+      offsets = [self.vertexElements[name]["offset"] for name in names]
+      if len(names) == 1 or any(view.strides[0] != stride for view in views) \
+          or stride % itemsize or any(offset % itemsize for offset in offsets):
+        for (name, view) in zip(names, views):
+          bounds[name] = (view.min(axis=0), view.max(axis=0))
+        continue
+      # one view spanning all the group's elements, sliced after reducing
+      start = min(offsets)
+      end = max(offset + view.shape[1] * itemsize for (offset, view) in zip(offsets, views))
+      span = np.ndarray((numVertices, (end - start) // itemsize), dtype=views[0].dtype, buffer=buffers[dataIndex],
+                        offset=start, strides=(stride, itemsize))
+      (low, high) = (span.min(axis=0), span.max(axis=0))
+      for (name, view, offset) in zip(names, views, offsets):
+        columns = slice((offset - start) // itemsize, (offset - start) // itemsize + view.shape[1])
+        bounds[name] = (low[columns], high[columns])
+
+    self.attributeStats = (buffers, bounds)
+    return bounds
@@ -1,6 +1,8 @@
 from PowerVR.EPOD import *
+from PowerVR.PVRDeferred import PVRDeferred
+from PowerVR.PVRSceneGraph import PVRSceneGraph
 
-class PVRModel:
+class PVRModel(PVRDeferred):
   def __init__(self):
     self.clearColour = None
     self.ambientColour = None
@@ -15,7 +17,8 @@ class PVRModel:
     self.meshes = []
 
     self.numNodes = 0
-    self.numMeshNodes = 0
+    # None when the POD has no eSceneNumMeshNodes tag
+    self.numMeshNodes = None
     self.nodes = []
 
     self.numTextures = 0
@@ -33,4 +36,9 @@ class PVRModel:
     self.units = 0.0
     self.flags = 0
 
-    self.cache = {}
\ No newline at end of file
+    self.cache = {}
+
+  def BuildSceneGraph(self):
+    # Builds a PVRSceneGraph (needs numpy) of the current nodes. It is a
+    # snapshot: build a new one after changing the nodes.
+    return PVRSceneGraph(self.nodes, self.numMeshNodes)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from PowerVR.PVRAnimation import EPVRAnimation, PVRAnimation
+from PowerVR.PVRDeferred import PVRDeferred
 
-class PVRNode:
+class PVRNode(PVRDeferred):
   def __init__(self):
     self.index = -1
     self.name = ""
@@ -0,0 +1,99 @@
+import json
+import os
+
+# Table of contents for a POD file, saved next to it as <name>.podidx.
+# Records where each mesh, node, material and texture block lives in the
+# file plus a few key scalars, so later opens can seek straight to the
+# block they need instead of walking every tag again.
+
+class PVRPODIndex:
+  formatVersion = 1
+  blockTypes = ("meshes", "nodes", "textures", "materials")
+
+  def __init__(self, podPath):
+    self.podPath = podPath
+    self.size = 0
+    self.mtime = 0
+    self.versionString = None
+    self.blocks = {name: [] for name in self.blockTypes}
+
+  @staticmethod
+  def PathFor(podPath):
+    return os.path.splitext(podPath)[0] + ".podidx"
+
+  @classmethod
+  def build(cls, podPath, versionString, scene, extents):
+    # extents: block type -> [(offset, length), ...] as recorded by the loader
+    index = cls(podPath)
+    stat = os.stat(podPath)
+    index.size = stat.st_size
+    index.mtime = stat.st_mtime_ns
+    index.versionString = versionString
+
+    for (mesh, (offset, length)) in zip(scene.meshes, extents["meshes"]):
+      index.blocks["meshes"].append({
+        "offset": offset,
+        "length": length,
+        "numVertices": mesh.primitiveData["numVertices"],
+        "numFaces": mesh.primitiveData["numFaces"],
+      })
+    for (node, (offset, length)) in zip(scene.nodes, extents["nodes"]):
+      index.blocks["nodes"].append({
+        "offset": offset,
+        "length": length,
+        "name": node.name,
+        "index": node.index,
+        "parentIndex": node.parentIndex,
+        "materialIndex": node.materialIndex,
+      })
+    for (texture, (offset, length)) in zip(scene.textures, extents["textures"]):
+      index.blocks["textures"].append({
+        "offset": offset,
+        "length": length,
+        "name": texture.name,
+      })
+    for (material, (offset, length)) in zip(scene.materials, extents["materials"]):
+      index.blocks["materials"].append({
+        "offset": offset,
+        "length": length,
+        "name": material.name,
+        "diffuseTextureIndex": material.diffuseTextureIndex,
+      })
+    return index
+
+  @classmethod
+  def load(cls, podPath):
+    # Returns None if there is no index or it no longer matches the POD.
+    try:
+      with open(cls.PathFor(podPath), "r") as f:
+        data = json.load(f)
+      stat = os.stat(podPath)
+    except (OSError, ValueError):
+      return None
+    if data.get("formatVersion") != cls.formatVersion \
+        or data.get("size") != stat.st_size or data.get("mtime") != stat.st_mtime_ns:
+      return None
+    index = cls(podPath)
+    index.size = data["size"]
+    index.mtime = data["mtime"]
+    index.versionString = data["versionString"]
+    for name in cls.blockTypes:
+      index.blocks[name] = data["blocks"][name]
+    return index
+
+  def Save(self, path=None):
+    with open(path or self.PathFor(self.podPath), "w") as f:
+      json.dump({
+        "formatVersion": self.formatVersion,
+        "size": self.size,
+        "mtime": self.mtime,
+        "versionString": self.versionString,
+        "blocks": self.blocks,
+      }, f, separators=(",", ":"))
+
+  def Find(self, blockType, name):
+    # index of the first block of that type with the given name, or -1
+    for (i, entry) in enumerate(self.blocks[blockType]):
+      if entry.get("name") == name:
+        return i
+    return -1
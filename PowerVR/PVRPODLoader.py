@@ -1,5 +1,6 @@
 import struct
 import array
+import mmap
 
 from PowerVR.EPOD import EPODIdentifiers, EPODDefines
 from PowerVR.PVRModel import PVRModel
@@ -9,20 +10,118 @@ from PowerVR.PVRMaterial import PVRMaterial  # , EPVRMaterial
 from PowerVR.PVRTexture import PVRTexture
 # from PowerVR.PVRCamera import PVRCamera
 from PowerVR.PVRNode import PVRNode
+from PowerVR.PVRPODIndex import PVRPODIndex
 
 # https://github.com/powervr-graphics/WebGL_SDK/blob/4.0/Tools/PVRPODLoader.js
 
+# precompiled decoders shared by every tag reader
+tagStruct = struct.Struct("<II")
+int32 = struct.Struct("<i")
+uint32 = struct.Struct("<I")
+float32 = struct.Struct("<f")
+
+def StartTags(table):
+  return {ident | EPODDefines.startTagMask: entry for (ident, entry) in table.items()}
+
 class PVRPODLoader:
-  def __init__(self, stream):
+  def __init__(self, stream, zeroCopy=False, lazy=False, index=None):
     self.stream = stream
+    # In zero-copy mode the file is mapped and bulk payloads (vertex data,
+    # indices, animation tracks) are handed out as memoryview slices of the
+    # mapping instead of being copied into new bytes/array objects.
+    self.buffer = None
+    self.tagBuffer = bytearray(tagStruct.size)
+    if zeroCopy:
+      self.stream = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+      self.buffer = memoryview(self.stream)
+    # In lazy mode only the offset and length of mesh, animation and user
+    # data payloads are recorded; they are read when first accessed.
+    self.lazy = lazy
     self.scene = None
     self.versionString = None
-    self.Read()
+    # (offset, length) of every scene child block, used to build an index
+    self.extents = {name: [] for name in PVRPODIndex.blockTypes}
+    self.index = index
+    if index is None:
+      self.Read()
+    else:
+      # blocks are read on request through ReadMesh/ReadNode/...
+      self.versionString = index.versionString
 
   @classmethod
-  def open(cls, path):
+  def open(cls, path, zeroCopy=False, lazy=False):
+    if lazy and not zeroCopy:
+      # deferred payloads are read back from the file later, so the loader
+      # owns it and close() closes it
+      return cls(open(path, "rb"), zeroCopy, lazy)
+    # the mapping outlives the file handle, so closing it here is fine
     with open(path, "rb") as buffer:
-      return cls(buffer)
+      return cls(buffer, zeroCopy, lazy)
+
+  @classmethod
+  def openIndexed(cls, path, zeroCopy=False, lazy=False, save=True):
+    # Uses the .podidx next to the POD if it still matches the file's size
+    # and mtime. Otherwise the whole file is walked once and the index is
+    # built (and saved unless save=False); scene is only set in that case.
+    index = PVRPODIndex.load(path)
+    if zeroCopy:
+      # blocks are read from the mapping, which outlives the file handle
+      with open(path, "rb") as stream:
+        loader = cls(stream, zeroCopy, lazy, index)
+    else:
+      # the loader owns the file and close() closes it
+      loader = cls(open(path, "rb"), zeroCopy, lazy, index)
+    if index is None:
+      loader.index = loader.BuildIndex(path)
+      if save:
+        # the index is only a cache: PODs in read-only directories (e.g.
+        # extracted game data) just go without one on disk
+        try:
+          loader.index.Save()
+        except OSError:
+          pass
+    return loader
+
+  def BuildIndex(self, path):
+    return PVRPODIndex.build(path, self.versionString, self.scene, self.extents)
+
+  def ReadIndexed(self, blockType, blockIndex, readBlock):
+    position = self.stream.tell()
+    self.stream.seek(self.index.blocks[blockType][blockIndex]["offset"])
+    block = readBlock(self)
+    self.stream.seek(position)
+    return block
+
+  def ReadMesh(self, meshIndex):
+    return self.ReadIndexed("meshes", meshIndex, PVRPODLoader.ReadMeshBlock)
+
+  def ReadNode(self, nodeIndex):
+    return self.ReadIndexed("nodes", nodeIndex, PVRPODLoader.ReadNodeBlock)
+
+  def ReadTexture(self, textureIndex):
+    return self.ReadIndexed("textures", textureIndex, PVRPODLoader.ReadTextureBlock)
+
+  def ReadMaterial(self, materialIndex):
+    return self.ReadIndexed("materials", materialIndex, PVRPODLoader.ReadMaterialBlock)
+
+  def close(self):
+    # In zero-copy mode the scene's payloads are views of the mapping, and
+    # it can't be closed while any of them is alive. It is then left to
+    # close itself once the last view is gone.
+    if self.buffer is not None:
+      self.buffer.release()
+      self.buffer = None
+    try:
+      self.stream.close()
+    except BufferError:
+      pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+    return False
   
   def Read(self):
     for (ident, length) in self.ReadTags():
@@ -38,11 +137,47 @@ class PVRPODLoader:
       else:
         self.stream.seek(length, 1)
 
+  def ReadData(self, length):
+    if self.buffer is None:
+      return self.stream.read(length)
+    offset = self.stream.tell()
+    self.stream.seek(length, 1)
+    return self.buffer[offset:offset + length]
+
+  def ReadArray(self, typecode, length):
+    if self.buffer is None:
+      return array.array(typecode, self.stream.read(length))
+    # memoryview.cast exposes the same indexing/tolist/tobytes/itemsize
+    # interface as array.array without copying
+    return self.ReadData(length).cast(typecode)
+
+  def ReadAt(self, offset, length, typecode=None):
+    position = self.stream.tell()
+    self.stream.seek(offset)
+    if typecode is None:
+      data = self.ReadData(length)
+    else:
+      data = self.ReadArray(typecode, length)
+    self.stream.seek(position)
+    return data
+
+  def DeferData(self, length, typecode=None):
+    # skip the payload and return a function that reads it back later
+    offset = self.stream.tell()
+    self.stream.seek(length, 1)
+    return lambda: self.ReadAt(offset, length, typecode)
+
   def ReadTag(self):
-    try:
-      return struct.unpack("<II", self.stream.read(8))
-    except struct.error:
+    if self.buffer is not None:
+      # mmap has no readinto, decode straight out of the mapping
+      offset = self.stream.tell()
+      if offset + tagStruct.size > len(self.buffer):
+        return None
+      self.stream.seek(tagStruct.size, 1)
+      return tagStruct.unpack_from(self.buffer, offset)
+    if self.stream.readinto(self.tagBuffer) != tagStruct.size:
       return None
+    return tagStruct.unpack(self.tagBuffer)
   
   def ReadTags(self):
     tag = self.ReadTag()
@@ -50,345 +185,127 @@ class PVRPODLoader:
       yield tag
       tag = self.ReadTag()
 
-  def ReadSceneBlock(self):
-    model = PVRModel()
+  def ReadBlock(self, target, blockIdentifier, table):
+    # Decodes every tag found in the block's dispatch table into target.
+    # Tags the table doesn't cover are handed back to the caller.
+    endTag = blockIdentifier | EPODDefines.endTagMask
     for (ident, length) in self.ReadTags():
+      if ident == endTag:
+        return
+      entry = table.get(ident)
+      if entry is None:
+        yield (ident, length)
+        continue
+      (reader, owner, name, decoder) = entry
+      reader(self, target if owner is None else getattr(target, owner), name, decoder, length)
+
+  @staticmethod
+  def Store(target, name, value):
+    if isinstance(target, dict):
+      target[name] = value
+    else:
+      setattr(target, name, value)
+
+  # Tag readers used by the dispatch tables below. They all take
+  # (target, name, decoder, length); decoder is a precompiled struct.Struct,
+  # an array typecode or a block reader depending on the reader.
+
+  def ReadScalar(self, target, name, decoder, length):
+    self.Store(target, name, decoder.unpack_from(self.stream.read(length))[0])
+
+  def ReadValues(self, target, name, typecode, length):
+    self.Store(target, name, array.array(typecode, self.stream.read(length)))
+
+  def ReadText(self, target, name, decoder, length):
+    self.Store(target, name, self.ReadString(length))
+
+  def ReadPayload(self, target, name, typecode, length):
+    if self.lazy:
+      target.Defer(name, self.DeferData(length, typecode))
+    elif typecode is None:
+      setattr(target, name, self.ReadData(length))
+    else:
+      setattr(target, name, self.ReadArray(typecode, length))
+
+  def ReadChild(self, target, name, readBlock, length):
+    offset = self.stream.tell()
+    getattr(target, name).append(readBlock(self))
+    self.extents[name].append((offset, self.stream.tell() - offset))
+
+  def ReadUnsupported(self, target, name, decoder, length):
+    print(name, "not implemented")
+    self.stream.seek(length, 1)
 
-      if ident == EPODIdentifiers.eScene | EPODDefines.endTagMask:
-        # do final checks, break tag loop
-        return model
-
-      elif ident == EPODIdentifiers.eSceneClearColour | EPODDefines.startTagMask:
-        model.clearColour = array.array('f', self.stream.read(12))
-
-      elif ident == EPODIdentifiers.eSceneAmbientColour | EPODDefines.startTagMask:
-        model.ambientColour = array.array('f', self.stream.read(12))
-
-      elif ident == EPODIdentifiers.eSceneNumCameras | EPODDefines.startTagMask:
-        model.numCameras = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumLights | EPODDefines.startTagMask:
-        model.numLights = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumMeshes | EPODDefines.startTagMask:
-        model.numMeshes = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumNodes | EPODDefines.startTagMask:
-        model.numNodes = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumMeshNodes | EPODDefines.startTagMask:
-        model.numMeshNodes = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumTextures | EPODDefines.startTagMask:
-        model.numTextures = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumMaterials | EPODDefines.startTagMask:
-        model.numMaterials = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneNumFrames | EPODDefines.startTagMask:
-        model.numFrames = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneFlags | EPODDefines.startTagMask:
-        model.flags = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneFPS | EPODDefines.startTagMask:
-        model.fps = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneUserData | EPODDefines.startTagMask:
-        model.userData = self.stream.read(length)
-
-      elif ident == EPODIdentifiers.eSceneUnits | EPODDefines.startTagMask:
-        model.units = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eSceneCamera | EPODDefines.startTagMask:
-        print("camera not implemented")
-        self.stream.read(length)
-
-      elif ident == EPODIdentifiers.eSceneLight | EPODDefines.startTagMask:
-        print("light not implemented")
-        self.stream.read(length)
-
-      elif ident == EPODIdentifiers.eSceneMesh | EPODDefines.startTagMask:
-        mesh = self.ReadMeshBlock()
-        model.meshes.append(mesh)
-
-      elif ident == EPODIdentifiers.eSceneNode | EPODDefines.startTagMask:
-        node = self.ReadNodeBlock()
-        model.nodes.append(node)
-
-      elif ident == EPODIdentifiers.eSceneTexture | EPODDefines.startTagMask:
-        texture = self.ReadTextureBlock()
-        model.textures.append(texture)
-
-      elif ident == EPODIdentifiers.eSceneMaterial | EPODDefines.startTagMask:
-        material = self.ReadMaterialBlock()
-        model.materials.append(material)
-
+  def ReadSceneBlock(self):
+    model = PVRModel()
+    for (ident, length) in self.ReadBlock(model, EPODIdentifiers.eScene, self.sceneTags):
       # Skip unimplemented block types
-      else:
-        self.stream.seek(length, 1)
+      self.stream.seek(length, 1)
+    return model
 
   def ReadNodeBlock(self):
     node = PVRNode()
-    animation = node.animation
-    isOldFormat = False
-
-    for (ident, length) in self.ReadTags():
-      if ident == EPODIdentifiers.eSceneNode | EPODDefines.endTagMask:
-        # do final checks
-        return node
-
-      elif ident == EPODIdentifiers.eNodeIndex | EPODDefines.startTagMask:
-        node.index = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eNodeName | EPODDefines.startTagMask:
-        node.name = self.ReadString(length)
-
-      elif ident == EPODIdentifiers.eNodeMaterialIndex | EPODDefines.startTagMask:
-        node.materialIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eNodeParentIndex | EPODDefines.startTagMask:
-        node.parentIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eNodePosition | EPODDefines.startTagMask: # Deprecated
-        pos = array.array('f', self.stream.read(length))
-        isOldFormat = True;
-
-      elif ident == EPODIdentifiers.eNodeRotation | EPODDefines.startTagMask: # Deprecated
-        rotation = array.array('f', self.stream.read(length))
-        isOldFormat = True;
-
-      elif ident == EPODIdentifiers.eNodeScale | EPODDefines.startTagMask: # Deprecated
-        scale = array.array('f', self.stream.read(length))
-        isOldFormat = True;
-      		
-      elif ident == EPODIdentifiers.eNodeMatrix | EPODDefines.startTagMask:	# Deprecated
-        matrix = array.array('f', self.stream.read(length))
-        isOldFormat = True;
-      
-      elif ident == EPODIdentifiers.eNodeAnimationPosition | EPODDefines.startTagMask:
-        animation.positions = array.array('f', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationRotation | EPODDefines.startTagMask:
-        animation.rotations = array.array('f', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationScale | EPODDefines.startTagMask:
-        animation.scales = array.array('f', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationMatrix | EPODDefines.startTagMask:
-        animation.matrices = array.array('f', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationFlags | EPODDefines.startTagMask:
-        animation.flags = struct.unpack("<I", self.stream.read(4))[0]
-      
-      elif ident == EPODIdentifiers.eNodeAnimationPositionIndex | EPODDefines.startTagMask:
-        animation.positionIndices = array.array('I', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationRotationIndex | EPODDefines.startTagMask:
-        animation.rotationIndices = array.array('I', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationScaleIndex | EPODDefines.startTagMask:
-        animation.scaleIndices = array.array('I', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeAnimationMatrixIndex | EPODDefines.startTagMask:
-        animation.matrixIndices = array.array('I', self.stream.read(length))
-      
-      elif ident == EPODIdentifiers.eNodeUserData | EPODDefines.startTagMask:
-        node.userData = self.stream.read(length)
-      
-      # skip unkown blocks
-      else:
-        self.stream.seek(length, 1)
+    # the deprecated eNodePosition/Rotation/Scale/Matrix blocks are skipped
+    for (ident, length) in self.ReadBlock(node, EPODIdentifiers.eSceneNode, self.nodeTags):
+      self.stream.seek(length, 1)
+    return node
 
   def ReadMeshBlock(self):
     mesh = PVRMesh()
     numUVWs = 0
-    podUVWs = 0
     interleavedDataIndex = -1
-    for (ident, length) in self.ReadTags():
-
-      if ident == EPODIdentifiers.eSceneMesh | EPODDefines.endTagMask:
-        # do final checks
-        # break tag loop
-        return mesh
-
-      elif ident == EPODIdentifiers.eMeshNumVertices | EPODDefines.startTagMask:
-        mesh.primitiveData["numVertices"] = struct.unpack("<I", self.stream.read(4))[0]
+    deferredData = []
+    for (ident, length) in self.ReadBlock(mesh, EPODIdentifiers.eSceneMesh, self.meshTags):
 
-      elif ident == EPODIdentifiers.eMeshNumFaces | EPODDefines.startTagMask:
-        mesh.primitiveData["numFaces"] = struct.unpack("<I", self.stream.read(4))[0]
+      if ident in self.vertexElementTags:
+        self.ReadVertexData(mesh, self.vertexElementTags[ident], ident, interleavedDataIndex, deferredData)
 
-      elif ident == EPODIdentifiers.eMeshNumUVWChannels | EPODDefines.startTagMask:
-        podUVWs = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMeshStripLength | EPODDefines.startTagMask:
-        mesh.primitiveData["stripLengths"] = array.array('I', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMeshNumStrips | EPODDefines.startTagMask:
-        mesh.primitiveData["numStrips"] = struct.unpack("<I", self.stream.read(4))[0]
+      elif ident == EPODIdentifiers.eMeshUVWList | EPODDefines.startTagMask:
+        self.ReadVertexData(mesh, "TEXCOORD_" + str(numUVWs), ident, interleavedDataIndex, deferredData)
+        numUVWs += 1
 
       elif ident == EPODIdentifiers.eMeshInteravedDataList | EPODDefines.startTagMask:
-        mesh.AddData(self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMeshBoneBatchIndexList | EPODDefines.startTagMask:
-        mesh.boneBatches["batches"] = array.array('I', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMeshNumBoneIndicesPerBatch | EPODDefines.startTagMask:
-        mesh.boneBatches["boneCounts"] = array.array('I', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMeshBoneOffsetPerBatch | EPODDefines.startTagMask:
-        mesh.boneBatches["offsets"] = array.array('I', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMeshMaxNumBonesPerBatch | EPODDefines.startTagMask:
-        mesh.boneBatches["boneMax"] = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMeshNumBoneBatches | EPODDefines.startTagMask:
-        mesh.boneBatches["count"] = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMeshUnpackMatrix | EPODDefines.startTagMask:
-        mesh.unpackMatrix = array.array('f', self.stream.read(length))
+        # comes before the vertex lists, which then only hold offsets into it
+        interleavedDataIndex = self.AddMeshData(mesh, length, deferredData)
 
       elif ident == EPODIdentifiers.eMeshVertexIndexList | EPODDefines.startTagMask:
-        (data, dataType) = self.ReadVertexIndexData()
-        mesh.AddFaces(data, dataType)
-
-      elif ident == EPODIdentifiers.eMeshVertexList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "POSITION", ident, interleavedDataIndex)
-
-      elif ident == EPODIdentifiers.eMeshNormalList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "NORMAL", ident, interleavedDataIndex)
-
-      elif ident == EPODIdentifiers.eMeshTangentList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "TANGENT", ident, interleavedDataIndex)
-
-      elif ident == EPODIdentifiers.eMeshBinormalList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "BINORMAL", ident, interleavedDataIndex)
-
-      elif ident == EPODIdentifiers.eMeshUVWList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "TEXCOORD_" + str(numUVWs), ident, interleavedDataIndex)
-        numUVWs += 1
-      
-      elif ident == EPODIdentifiers.eMeshVertexColourList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "COLOR_0", ident, interleavedDataIndex)
-      
-      elif ident == EPODIdentifiers.eMeshBoneIndexList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "JOINTS_0", ident, interleavedDataIndex)
-      
-      elif ident == EPODIdentifiers.eMeshBoneWeightList | EPODDefines.startTagMask:
-        self.ReadVertexData(mesh, "WEIGHTS_0", ident, interleavedDataIndex)
+        (data, dataType, numIndices) = self.ReadVertexIndexData()
+        if self.lazy:
+          mesh.AddDeferredFaces(data, dataType, numIndices)
+        else:
+          mesh.AddFaces(data, dataType)
 
       else:
         self.stream.seek(length, 1)
 
+    if deferredData:
+      mesh.Defer("vertexElementData", lambda: [fetch() for fetch in deferredData])
+    return mesh
+
+  def AddMeshData(self, mesh, length, deferredData):
+    # index of the new buffer in mesh.vertexElementData
+    if self.lazy:
+      deferredData.append(self.DeferData(length))
+      return len(deferredData) - 1
+    return mesh.AddData(self.ReadData(length))
+
   def ReadTextureBlock(self):
     texture = PVRTexture()
-    for (ident, length) in self.ReadTags():
-      if ident == EPODIdentifiers.eSceneTexture | EPODDefines.endTagMask:
-        # do final checks
-        return texture
-
-      elif ident == EPODIdentifiers.eTextureFilename | EPODDefines.startTagMask:
+    for (ident, length) in self.ReadBlock(texture, EPODIdentifiers.eSceneTexture, {}):
+      if ident == EPODIdentifiers.eTextureFilename | EPODDefines.startTagMask:
         texture.setName(self.ReadString(length))
-        
+
       # skip unkown blocks
       else:
         self.stream.seek(length, 1)
+    return texture
 
   def ReadMaterialBlock(self):
     material = PVRMaterial()
-
-    for (ident, length) in self.ReadTags():
-      if ident == EPODIdentifiers.eSceneMaterial | EPODDefines.endTagMask:
-        # do final checks
-        return material
-
-      elif ident == EPODIdentifiers.eMaterialName | EPODDefines.startTagMask:
-        material.name = self.ReadString(length)
-
-      elif ident == EPODIdentifiers.eMaterialDiffuseTextureIndex | EPODDefines.startTagMask:
-        material.diffuseTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialOpacity | EPODDefines.startTagMask:
-        material.opacity = struct.unpack("<f", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialAmbientColour | EPODDefines.startTagMask:
-        material.ambient = array.array('f', self.stream.read(12))
-        
-      elif ident == EPODIdentifiers.eMaterialDiffuseColour | EPODDefines.startTagMask:
-        material.diffuse = array.array('f', self.stream.read(12))
-
-      elif ident == EPODIdentifiers.eMaterialSpecularColour | EPODDefines.startTagMask:
-        material.specular = array.array('f', self.stream.read(12))
-
-      elif ident == EPODIdentifiers.eMaterialShininess | EPODDefines.startTagMask:
-        material.specular = struct.unpack("<f", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialEffectFile | EPODDefines.startTagMask:
-        material.effectFile = self.ReadString(length)
-
-      elif ident == EPODIdentifiers.eMaterialEffectName | EPODDefines.startTagMask:
-        material.effectName = self.ReadString(length)
-
-      elif ident == EPODIdentifiers.eMaterialAmbientTextureIndex | EPODDefines.startTagMask:
-        material.ambientTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialSpecularColourTextureIndex | EPODDefines.startTagMask:
-        material.specularColourTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialSpecularLevelTextureIndex | EPODDefines.startTagMask:
-        material.specularLevelTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBumpMapTextureIndex | EPODDefines.startTagMask:
-        material.bumpMapTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialEmissiveTextureIndex | EPODDefines.startTagMask:
-        material.emissiveTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialGlossinessTextureIndex | EPODDefines.startTagMask:
-        material.glossinessTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialOpacityTextureIndex | EPODDefines.startTagMask:
-        material.opacityTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialReflectionTextureIndex | EPODDefines.startTagMask:
-        material.reflectionTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialRefractionTextureIndex | EPODDefines.startTagMask:
-        material.refractionTextureIndex = struct.unpack("<i", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingRGBSrc | EPODDefines.startTagMask:
-        material.blendSrcRGB = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingAlphaSrc | EPODDefines.startTagMask:
-        material.blendSrcA = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingRGBDst | EPODDefines.startTagMask:
-        material.blendDstRGB = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingAlphaDst | EPODDefines.startTagMask:
-        material.blendDstA = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingRGBOperation | EPODDefines.startTagMask:
-        material.blendOpRGB = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingAlphaOperation | EPODDefines.startTagMask:
-        material.blendOpA = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialBlendingRGBAColour | EPODDefines.startTagMask:
-        material.blendColour = array.array('f', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMaterialBlendingFactorArray | EPODDefines.startTagMask:
-        material.blendFactor =  array.array('f', self.stream.read(length))
-
-      elif ident == EPODIdentifiers.eMaterialFlags | EPODDefines.startTagMask:
-        material.flags = struct.unpack("<I", self.stream.read(4))[0]
-
-      elif ident == EPODIdentifiers.eMaterialUserData | EPODDefines.startTagMask:
-        material.userData = self.stream.read(length)
-
+    for (ident, length) in self.ReadBlock(material, EPODIdentifiers.eSceneMaterial, self.materialTags):
       # skip unkown blocks
-      else:
-        self.stream.seek(length, 1)
+      self.stream.seek(length, 1)
+    return material
 
   def ReadString(self, length):
     return self.stream.read(length).decode("utf-8").strip("\x00")
@@ -396,13 +313,14 @@ class PVRPODLoader:
   def ReadVertexIndexData(self):
     data = None
     dataType = EPVRMesh.FaceData.e16Bit
+    numIndices = 0
 
     for (ident, length) in self.ReadTags():
       if ident == EPODIdentifiers.eMeshVertexIndexList | EPODDefines.endTagMask:
-        return (data, dataType)
+        return (data, dataType, numIndices)
       
       elif ident == EPODIdentifiers.eBlockDataType | EPODDefines.startTagMask:
-        value = struct.unpack("<i", self.stream.read(4))[0]
+        value = int32.unpack(self.stream.read(4))[0]
         if value == EPVRMesh.VertexData.eUnsignedInt:
           dataType = EPVRMesh.FaceData.e32Bit
         elif value == EPVRMesh.VertexData.eUnsignedShort:
@@ -411,15 +329,17 @@ class PVRPODLoader:
           print("unhandled vert data type:", value)
 
       elif ident == EPODIdentifiers.eBlockData | EPODDefines.startTagMask:
-        if dataType == EPVRMesh.FaceData.e16Bit:
-          data = array.array('H', self.stream.read(length))
-        elif dataType == EPVRMesh.FaceData.e32Bit:
-          data = array.array('I', self.stream.read(length))
+        typecode = 'I' if dataType == EPVRMesh.FaceData.e32Bit else 'H'
+        numIndices = length // array.array(typecode).itemsize
+        if self.lazy:
+          data = self.DeferData(length, typecode)
+        else:
+          data = self.ReadArray(typecode, length)
       
       else:
         self.stream.seek(length, 1)
 
-  def ReadVertexData(self, mesh, semanticName, blockIdentifier, dataIndex):
+  def ReadVertexData(self, mesh, semanticName, blockIdentifier, dataIndex, deferredData):
     numComponents = 0
     stride = 0
     offset = 0
@@ -433,21 +353,120 @@ class PVRPODLoader:
         break
 
       elif ident == EPODIdentifiers.eBlockDataType | EPODDefines.startTagMask:
-        dataType = struct.unpack("<I", self.stream.read(4))[0]
+        dataType = uint32.unpack(self.stream.read(4))[0]
 
       elif ident == EPODIdentifiers.eBlockNumComponents | EPODDefines.startTagMask:
-        numComponents = struct.unpack("<i", self.stream.read(4))[0]
+        numComponents = int32.unpack(self.stream.read(4))[0]
 
       elif ident == EPODIdentifiers.eBlockStride | EPODDefines.startTagMask:
-        stride = struct.unpack("<i", self.stream.read(4))[0]
+        stride = int32.unpack(self.stream.read(4))[0]
 
       elif ident == EPODIdentifiers.eBlockData | EPODDefines.startTagMask:
-        # if dataIndex == -1:
-        #   print(struct.unpack("<I", self.stream.read(4))[0])
-        #   # data = np.frombuffer(self.stream.read(length), dtype=PVRVertexDataTypeMap[dataType])
-        #   # dataIndex = mesh.AddData(data)
-        # else:
-        offset = struct.unpack("<I", self.stream.read(4))[0]
+        if dataIndex == -1:
+          # no interleaved data: the block holds this element's own buffer
+          dataIndex = self.AddMeshData(mesh, length, deferredData)
+          offset = 0
+        else:
+          offset = uint32.unpack(self.stream.read(4))[0]
 
       else: 
         self.stream.seek(length, 1)
+
+  # Dispatch tables: start tag -> (reader, owner attribute, name, decoder).
+  # Built once from EPODIdentifiers so the block loops above are a single
+  # dict lookup per tag instead of a chain of comparisons.
+
+  sceneTags = StartTags({
+    EPODIdentifiers.eSceneClearColour:   (ReadValues, None, "clearColour", 'f'),
+    EPODIdentifiers.eSceneAmbientColour: (ReadValues, None, "ambientColour", 'f'),
+    EPODIdentifiers.eSceneNumCameras:    (ReadScalar, None, "numCameras", int32),
+    EPODIdentifiers.eSceneNumLights:     (ReadScalar, None, "numLights", int32),
+    EPODIdentifiers.eSceneNumMeshes:     (ReadScalar, None, "numMeshes", int32),
+    EPODIdentifiers.eSceneNumNodes:      (ReadScalar, None, "numNodes", int32),
+    EPODIdentifiers.eSceneNumMeshNodes:  (ReadScalar, None, "numMeshNodes", int32),
+    EPODIdentifiers.eSceneNumTextures:   (ReadScalar, None, "numTextures", int32),
+    EPODIdentifiers.eSceneNumMaterials:  (ReadScalar, None, "numMaterials", int32),
+    EPODIdentifiers.eSceneNumFrames:     (ReadScalar, None, "numFrames", int32),
+    EPODIdentifiers.eSceneFlags:         (ReadScalar, None, "flags", int32),
+    EPODIdentifiers.eSceneFPS:           (ReadScalar, None, "fps", int32),
+    EPODIdentifiers.eSceneUserData:      (ReadPayload, None, "userData", None),
+    EPODIdentifiers.eSceneUnits:         (ReadScalar, None, "units", int32),
+    EPODIdentifiers.eSceneCamera:        (ReadUnsupported, None, "camera", None),
+    EPODIdentifiers.eSceneLight:         (ReadUnsupported, None, "light", None),
+    EPODIdentifiers.eSceneMesh:          (ReadChild, None, "meshes", ReadMeshBlock),
+    EPODIdentifiers.eSceneNode:          (ReadChild, None, "nodes", ReadNodeBlock),
+    EPODIdentifiers.eSceneTexture:       (ReadChild, None, "textures", ReadTextureBlock),
+    EPODIdentifiers.eSceneMaterial:      (ReadChild, None, "materials", ReadMaterialBlock),
+  })
+
+  nodeTags = StartTags({
+    EPODIdentifiers.eNodeIndex:                  (ReadScalar, None, "index", int32),
+    EPODIdentifiers.eNodeName:                   (ReadText, None, "name", None),
+    EPODIdentifiers.eNodeMaterialIndex:          (ReadScalar, None, "materialIndex", int32),
+    EPODIdentifiers.eNodeParentIndex:            (ReadScalar, None, "parentIndex", int32),
+    EPODIdentifiers.eNodeAnimationPosition:      (ReadPayload, "animation", "positions", 'f'),
+    EPODIdentifiers.eNodeAnimationRotation:      (ReadPayload, "animation", "rotations", 'f'),
+    EPODIdentifiers.eNodeAnimationScale:         (ReadPayload, "animation", "scales", 'f'),
+    EPODIdentifiers.eNodeAnimationMatrix:        (ReadPayload, "animation", "matrices", 'f'),
+    EPODIdentifiers.eNodeAnimationFlags:         (ReadScalar, "animation", "flags", uint32),
+    EPODIdentifiers.eNodeAnimationPositionIndex: (ReadPayload, "animation", "positionIndices", 'I'),
+    EPODIdentifiers.eNodeAnimationRotationIndex: (ReadPayload, "animation", "rotationIndices", 'I'),
+    EPODIdentifiers.eNodeAnimationScaleIndex:    (ReadPayload, "animation", "scaleIndices", 'I'),
+    EPODIdentifiers.eNodeAnimationMatrixIndex:   (ReadPayload, "animation", "matrixIndices", 'I'),
+    EPODIdentifiers.eNodeUserData:               (ReadPayload, None, "userData", None),
+  })
+
+  meshTags = StartTags({
+    EPODIdentifiers.eMeshNumVertices:            (ReadScalar, "primitiveData", "numVertices", uint32),
+    EPODIdentifiers.eMeshNumFaces:               (ReadScalar, "primitiveData", "numFaces", uint32),
+    EPODIdentifiers.eMeshStripLength:            (ReadValues, "primitiveData", "stripLengths", 'I'),
+    EPODIdentifiers.eMeshNumStrips:              (ReadScalar, "primitiveData", "numStrips", uint32),
+    EPODIdentifiers.eMeshBoneBatchIndexList:     (ReadValues, "boneBatches", "batches", 'I'),
+    EPODIdentifiers.eMeshNumBoneIndicesPerBatch: (ReadValues, "boneBatches", "boneCounts", 'I'),
+    EPODIdentifiers.eMeshBoneOffsetPerBatch:     (ReadValues, "boneBatches", "offsets", 'I'),
+    EPODIdentifiers.eMeshMaxNumBonesPerBatch:    (ReadScalar, "boneBatches", "boneMax", uint32),
+    EPODIdentifiers.eMeshNumBoneBatches:         (ReadScalar, "boneBatches", "count", uint32),
+    EPODIdentifiers.eMeshUnpackMatrix:           (ReadValues, None, "unpackMatrix", 'f'),
+  })
+
+  # vertex element blocks -> glTF attribute semantic (UVWs are numbered)
+  vertexElementTags = StartTags({
+    EPODIdentifiers.eMeshVertexList:       "POSITION",
+    EPODIdentifiers.eMeshNormalList:       "NORMAL",
+    EPODIdentifiers.eMeshTangentList:      "TANGENT",
+    EPODIdentifiers.eMeshBinormalList:     "BINORMAL",
+    EPODIdentifiers.eMeshVertexColourList: "COLOR_0",
+    EPODIdentifiers.eMeshBoneIndexList:    "JOINTS_0",
+    EPODIdentifiers.eMeshBoneWeightList:   "WEIGHTS_0",
+  })
+
+  materialTags = StartTags({
+    EPODIdentifiers.eMaterialName:                       (ReadText, None, "name", None),
+    EPODIdentifiers.eMaterialDiffuseTextureIndex:        (ReadScalar, None, "diffuseTextureIndex", int32),
+    EPODIdentifiers.eMaterialOpacity:                    (ReadScalar, None, "opacity", float32),
+    EPODIdentifiers.eMaterialAmbientColour:              (ReadValues, None, "ambient", 'f'),
+    EPODIdentifiers.eMaterialDiffuseColour:              (ReadValues, None, "diffuse", 'f'),
+    EPODIdentifiers.eMaterialSpecularColour:             (ReadValues, None, "specular", 'f'),
+    EPODIdentifiers.eMaterialShininess:                  (ReadScalar, None, "shininess", float32),
+    EPODIdentifiers.eMaterialEffectFile:                 (ReadText, None, "effectFile", None),
+    EPODIdentifiers.eMaterialEffectName:                 (ReadText, None, "effectName", None),
+    EPODIdentifiers.eMaterialAmbientTextureIndex:        (ReadScalar, None, "ambientTextureIndex", int32),
+    EPODIdentifiers.eMaterialSpecularColourTextureIndex: (ReadScalar, None, "specularTextureIndex", int32),
+    EPODIdentifiers.eMaterialSpecularLevelTextureIndex:  (ReadScalar, None, "specularLevelTextureIndex", int32),
+    EPODIdentifiers.eMaterialBumpMapTextureIndex:        (ReadScalar, None, "bumpMapTextureIndex", int32),
+    EPODIdentifiers.eMaterialEmissiveTextureIndex:       (ReadScalar, None, "emissiveTextureIndex", int32),
+    EPODIdentifiers.eMaterialGlossinessTextureIndex:     (ReadScalar, None, "glossinessTextureIndex", int32),
+    EPODIdentifiers.eMaterialOpacityTextureIndex:        (ReadScalar, None, "opacityTextureIndex", int32),
+    EPODIdentifiers.eMaterialReflectionTextureIndex:     (ReadScalar, None, "reflectionTextureIndex", int32),
+    EPODIdentifiers.eMaterialRefractionTextureIndex:     (ReadScalar, None, "refractionTextureIndex", int32),
+    EPODIdentifiers.eMaterialBlendingRGBSrc:             (ReadScalar, None, "blendSrcRGB", uint32),
+    EPODIdentifiers.eMaterialBlendingAlphaSrc:           (ReadScalar, None, "blendSrcA", uint32),
+    EPODIdentifiers.eMaterialBlendingRGBDst:             (ReadScalar, None, "blendDstRGB", uint32),
+    EPODIdentifiers.eMaterialBlendingAlphaDst:           (ReadScalar, None, "blendDstA", uint32),
+    EPODIdentifiers.eMaterialBlendingRGBOperation:       (ReadScalar, None, "blendOpRGB", uint32),
+    EPODIdentifiers.eMaterialBlendingAlphaOperation:     (ReadScalar, None, "blendOpA", uint32),
+    EPODIdentifiers.eMaterialBlendingRGBAColour:         (ReadValues, None, "blendColour", 'f'),
+    EPODIdentifiers.eMaterialBlendingFactorArray:        (ReadValues, None, "blendFactor", 'f'),
+    EPODIdentifiers.eMaterialFlags:                      (ReadScalar, None, "flags", uint32),
+    EPODIdentifiers.eMaterialUserData:                   (ReadPayload, None, "userData", None),
+  })
@@ -0,0 +1,62 @@
+class PVRSceneGraph:
+  # Structure-of-arrays view of a model's node hierarchy, built in linear
+  # time. Per node: parentIndices, meshIndices and materialIndices. POD
+  # files list mesh nodes first, then lights and cameras, whose node.index
+  # is a light or camera index; given numMeshNodes, meshIndices is -1 for
+  # those and for mesh nodes without a mesh. Without it (PODs lacking the
+  # eSceneNumMeshNodes tag) it is every node's raw index. A parent index
+  # outside the node list (-1 or malformed) makes a node one of the roots.
+  # The children of node i are children[childOffsets[i]:childOffsets[i +
+  # 1]], in node order. order lists every parent before its children, one
+  # depth after another: the nodes at depth d are
+  # order[levelOffsets[d]:levelOffsets[d + 1]]. Nodes that never reach a
+  # root (broken parent cycles) come last in order and are in no level.
+
+  def __init__(self, nodes, numMeshNodes=None):
+    import numpy as np
+
+    numNodes = len(nodes)
+    self.numNodes = numNodes
+    self.parentIndices = np.fromiter((node.parentIndex for node in nodes), dtype=np.int64, count=numNodes)
+    self.meshIndices = np.fromiter((node.index for node in nodes), dtype=np.int64, count=numNodes)
+    if numMeshNodes is not None:
+      self.meshIndices[max(numMeshNodes, 0):] = -1
+    self.materialIndices = np.fromiter((node.materialIndex for node in nodes), dtype=np.int64, count=numNodes)
+
+    # parent indices outside the node list make a node a root
+    hasParent = (self.parentIndices >= 0) & (self.parentIndices < numNodes)
+    childNodes = np.flatnonzero(hasParent)
+    parents = self.parentIndices[childNodes]
+    self.children = childNodes[np.argsort(parents, kind="stable")]
+    self.childOffsets = np.zeros(numNodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parents, minlength=numNodes), out=self.childOffsets[1:])
+    self.roots = np.flatnonzero(~hasParent)
+
+    levels = []
+    level = self.roots
+    reached = 0
+    while len(level) and reached < numNodes:
+      levels.append(level)
+      reached += len(level)
+      level = self.ChildrenOf(level)
+    self.levelOffsets = np.concatenate(([0], np.cumsum([len(level) for level in levels], dtype=np.int64)))
+    order = np.concatenate(levels) if levels else np.zeros(0, dtype=np.int64)
+    unreached = np.ones(numNodes, dtype=bool)
+    unreached[order] = False
+    self.order = np.concatenate((order, np.flatnonzero(unreached)))
+
+  def Children(self, nodeIndex):
+    return self.children[self.childOffsets[nodeIndex]:self.childOffsets[nodeIndex + 1]]
+
+  def ChildrenOf(self, nodeIndices):
+    # children of all the given nodes, concatenated in one gather
+    import numpy as np
+
+    starts = self.childOffsets[nodeIndices]
+    counts = self.childOffsets[nodeIndices + 1] - starts
+    runs = np.cumsum(counts) - counts
+    return self.children[np.repeat(starts - runs, counts) + np.arange(int(counts.sum()))]
+
+  def Levels(self):
+    for depth in range(len(self.levelOffsets) - 1):
+      yield self.order[self.levelOffsets[depth]:self.levelOffsets[depth + 1]]
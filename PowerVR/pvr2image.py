@@ -2,32 +2,49 @@
 
 import os
 import argparse
-from PVRTexture import PVRTexture, PixelFormat
+try:
+    from PowerVR.PVRTexture import PVRTexture, PixelFormat
+except ImportError:  # Run as a script from inside PowerVR/.
+    from PVRTexture import PVRTexture, PixelFormat
 import texture2ddecoder
+import numpy as np
 from PIL import Image
 
-def convert_bgra_to_rgba(data: bytes, width: int, height: int) -> bytes:
+def convert_bgra_to_rgba(data: bytes, width: int, height: int, out=None):
     """
     Convert BGRA raw data to RGBA format.
+    The result is written into out (any writable buffer of at least
+    width * height * 4 bytes, e.g. a bytearray reused across textures) if
+    given, otherwise into a new bytearray. Returns the buffer written to.
     """
-    rgba_data = bytearray(len(data))
-    for i in range(0, len(data), 4):
-        # Swap BGRA to RGBA
-        rgba_data[i] = data[i + 2]  # R <- B
-        rgba_data[i + 1] = data[i + 1]  # G <- G
-        rgba_data[i + 2] = data[i]  # B <- R
-        rgba_data[i + 3] = data[i + 3]  # A <- A
-    return bytes(rgba_data)
+    size = width * height * 4
+    src = np.frombuffer(data, dtype=np.uint8, count=size).reshape(-1, 4)
+    if out is None:
+        out = bytearray(size)
+    else:
+        view = memoryview(out)
+        if view.readonly:
+            raise ValueError("Output buffer is read-only")
+        if view.nbytes < size:
+            raise ValueError(f"Output buffer too small: {view.nbytes} bytes, {width}x{height} RGBA needs {size}")
+    dst = np.frombuffer(out, dtype=np.uint8, count=size).reshape(-1, 4)
+    # Swap BGRA to RGBA as whole-image strided copies.
+    dst[:, :3] = src[:, 2::-1]  # RGB <- BGR reversed
+    dst[:, 3] = src[:, 3]  # A <- A
+    return out
+
+# Pixel formats pvrtexture_to_image can decode.
+supported_pixel_formats = [
+    PixelFormat.PVRTC_2BPP_RGB,
+    PixelFormat.PVRTC_2BPP_RGBA,
+    PixelFormat.PVRTC_4BPP_RGB,
+    PixelFormat.PVRTC_4BPP_RGBA,
+    PixelFormat.ETC1
+]
 
-def pvrtexture_to_image(texture):  # input = PVRTexture type
+def pvrtexture_to_image(texture, out=None):  # input = PVRTexture type
     # Check if the pixel format is supported for decoding
-    if texture.pixel_format not in [
-        PixelFormat.PVRTC_2BPP_RGB,
-        PixelFormat.PVRTC_2BPP_RGBA,
-        PixelFormat.PVRTC_4BPP_RGB,
-        PixelFormat.PVRTC_4BPP_RGBA,
-        PixelFormat.ETC1
-    ]:
+    if texture.pixel_format not in supported_pixel_formats:
         raise NotImplementedError(f"Unsupported pixel format: {texture.pixel_format}")
 
     # Extract the highest resolution mipmap
@@ -49,10 +66,11 @@ def pvrtexture_to_image(texture):  # input = PVRTexture type
         raise NotImplementedError(f"Decoding for pixel format {texture.pixel_format} is not implemented.")
 
     # Convert BGRA to RGBA (texture2ddecoder emits BGRA)
-    rgba_data = convert_bgra_to_rgba(decoded_data, width, height)
+    rgba_data = convert_bgra_to_rgba(decoded_data, width, height, out)
 
-    # Convert the raw RGBA data to a PIL image
-    image = Image.frombytes('RGBA', (width, height), rgba_data)
+    # Convert the raw RGBA data to a PIL image (this copies, so a shared
+    # out buffer can be reused for the next texture right away)
+    image = Image.frombytes('RGBA', (width, height), memoryview(rgba_data)[:width * height * 4])
     return image
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+# Compares geometry size and conversion time of plain output against
+# --meshopt (and --quantize) on a set of PODs. Only meshes are converted,
+# textures are not touched, so no PVRTexTool is needed.
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+
+import pod2glb
+from GLB.GLBExporter import GLBExporter
+from PowerVR.PVRPODLoader import PVRPODLoader
+
+configs = [
+    ("plain", {}),
+    ("meshopt", {"meshopt": True, "meshopt_fallback": False}),
+    ("quantize", {"quantize": True}),
+    ("quantize+meshopt", {"quantize": True, "meshopt": True, "meshopt_fallback": False}),
+]
+
+def find_pods(inputs):
+    pods = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.pod")
+        pods += [pod_path for pod_path in glob.glob(pattern, recursive=True) if pod_path.lower().endswith(".pod")]
+    return sorted(set(pods))
+
+def measure(pod_path, options, repeat):
+    # Returns (BIN chunk size, best time of convert_meshes).
+    pod2glb.apply_options(options)
+    best = None
+    for _ in range(repeat):
+        converter = pod2glb.POD2GLB()
+        converter.glb = GLBExporter()
+        with PVRPODLoader.open(pod_path) as converter.pod:
+            converter.scene = converter.pod.scene
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                converter.convert_meshes()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    converter.glb.addPadding()
+    return (converter.glb.byteLength, best)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EXT_meshopt_compression output against plain GLB geometry.")
+    parser.add_argument("inputs", nargs="+", help="POD files, directories or glob patterns.")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per model and configuration, the fastest is reported (default: 3).")
+    args = parser.parse_args()
+
+    pods = find_pods(args.inputs)
+    if not pods:
+        parser.error("no .pod files matched the given inputs.")
+
+    # A model only counts towards the totals if every configuration
+    # converted it, so that all totals cover the same models.
+    totals = {name: [0, 0.0] for (name, options) in configs}
+    failed = []
+    print(f"{"model":<40}" + "".join(f"{name:>27}" for (name, options) in configs))
+    for pod_path in pods:
+        row = f"{os.path.basename(pod_path):<40}"
+        results = {}
+        for (name, options) in configs:
+            try:
+                results[name] = measure(pod_path, options, max(1, args.repeat))
+            except Exception as e:
+                row += f"{"error: " + type(e).__name__:>27}"
+                continue
+            (size, seconds) = results[name]
+            row += f"{size:>12} B {seconds * 1000:>9.1f} ms"
+        print(row)
+        if len(results) < len(configs):
+            failed.append(pod_path)
+            continue
+        for (name, (size, seconds)) in results.items():
+            totals[name][0] += size
+            totals[name][1] += seconds
+
+    (plain_size, plain_seconds) = totals["plain"]
+    print()
+    if failed:
+        print(f"{len(failed)} of {len(pods)} model(s) failed in at least one configuration and are not in the totals:")
+        for pod_path in failed:
+            print(f"  {pod_path}")
+        print()
+    for (name, options) in configs:
+        (size, seconds) = totals[name]
+        print(f"{name:<20} {size:>12} B ({100 * size / max(plain_size, 1):5.1f}% of plain) {seconds:8.3f} s ({seconds - plain_seconds:+.3f} s)")
+
+if __name__ == "__main__":
+    main()
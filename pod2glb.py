@@ -9,14 +9,28 @@ import subprocess as sp
 import platform
 import PIL
 import argparse
-
-# numpy is only needed for calculating bounding box
-hasnumpy = False
+import contextlib
+import glob
+import io
+import sys
+import time
+import traceback
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+from GLB import GLBQuantize, GLBMeshopt, GLBOptimize, GLBAnimation
+
+# texture2ddecoder is only needed to decode textures in-process instead of
+# launching PVRTexTool (or pvr2image.py) once per texture.
+hasdecoder = False
 try:
-    import numpy as np
-    hasnumpy = True
+    from PowerVR.pvr2image import pvrtexture_to_image, supported_pixel_formats
+    from PowerVR.PVRTexture import PVRTexture
+    hasdecoder = True
 except ImportError as e:
-    print(f"[WARNING] numpy could not be imported: {e}. Will not be able to calculate bounding box which is probably fine")
+    print(f"[DEBUG] Built-in texture decoder unavailable ({e}). Textures will be converted with PVRTexTool.")
 
 # Override default paths for tools.
 # These are overridden by the argparse arguments.
@@ -29,9 +43,96 @@ pathto = ""
 pathout = ""
 xmlroot = None  # Non-null if an XML was found.
 embedimage = False
+zerocopy = False  # Map the POD instead of copying payloads out of it.
+quantize = False  # Write KHR_mesh_quantization vertex data.
+meshopt = False  # Compress vertex/index bufferViews with EXT_meshopt_compression.
+meshoptfallback = True  # Also store the uncompressed data for viewers without it.
+optimizemeshes = False  # Reorder triangles/vertices for the GPU vertex cache.
+vertexlayout = "source"  # "source": a bufferView per POD vertex buffer, "interleave": one buffer.
+animationtolerance = 1e-4  # Largest error of dropped animation keyframes, negative keeps them all.
+texturejobs = os.cpu_count()  # Concurrent PVRTexTool conversions.
+texturecache = None  # TextureCache if --texture-cache was given.
+texturedecoder = "auto"  # "auto", "builtin" or "external" (PVRTexTool only).
 platform = platform.system()  # Determines path of binaries.
 
-print(f"""
+class TextureCache:
+    """
+    Content-addressed store of converted textures, shared between runs.
+    Entries are keyed by a hash of the .pvr bytes and the conversion
+    settings. evict() removes least-recently-used entries until the cache
+    is back under max_bytes; it scans the whole cache, so main() calls it
+    once per run rather than once per model.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(input_file, settings):
+        digest = hashlib.sha256(repr(settings).encode())
+        with open(input_file, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def fetch(self, key, output):
+        entry = self.entry_path(key)
+        try:
+            os.utime(entry)  # Mark as recently used.
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return False
+        if os.path.exists(output):
+            os.remove(output)
+        try:
+            os.link(entry, output)
+        except OSError:  # Different filesystem, no hard link support, etc.
+            shutil.copyfile(entry, output)
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, output):
+        entry = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # Copy then rename so concurrent converters never see half a file.
+        temp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(output, temp)
+        os.replace(temp, entry)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                if not file.endswith(".png"):
+                    continue
+                entry = os.path.join(root, file)
+                try:
+                    stat = os.stat(entry)
+                except FileNotFoundError:  # Evicted by another process.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+        entries.sort()
+        for (mtime, size, entry) in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def print_banner():
+    print(f"""
 -----------------------------------------------------------------------------------
                                   POD2GLB
                         originally made by jaames
@@ -79,10 +180,40 @@ class POD2GLB:
         1: 5126    # EPVRMesh.VertexData.eFloat
     }
 
+    # https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html#accessor-data-types
+    accessor_data_type_sizes = {
+        5120: 1,  # BYTE
+        5121: 1,  # UNSIGNED_BYTE
+        5122: 2,  # SHORT
+        5123: 2,  # UNSIGNED_SHORT
+        5125: 4,  # UNSIGNED_INT
+        5126: 4   # FLOAT
+    }
+    # https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html#_mesh_primitive_indices
+    index_size_to_accessor_data_types = {
+        1: 5121,  # UNSIGNED_BYTE
+        2: 5123,  # UNSIGNED_SHORT
+        4: 5125   # UNSIGNED_INT
+    }
+
     def __init__(self):
         self.glb = None
         self.pod = None
         self.scene = None
+        # Dequantization transforms of KHR_mesh_quantization meshes,
+        # applied by the nodes that reference them: mesh index -> TRS
+        self.mesh_dequantize = {}
+        # Skin joints (node indices) of skinned meshes: mesh index -> list
+        self.mesh_joints = {}
+        # PVRSceneGraph of the POD's nodes, built by convert_nodes
+        self.scene_graph = None
+        # EXT_meshopt_compression totals: bytes in, bytes out, seconds
+        self.meshopt_stats = [0, 0, 0.0]
+        # Shared glTF images/samplers, so textures reusing them point at
+        # one entry: resolved path or content hash -> image index,
+        # (mag, min, wrapS, wrapT) -> sampler index
+        self.image_indices = {}
+        self.sampler_indices = {}
         #self.fix_uvs = True
 
     @classmethod
@@ -97,7 +228,7 @@ class POD2GLB:
         # create a glb exporter
         self.glb = GLBExporter()
         # create a pvr pod parser
-        self.pod = PVRPODLoader.open(inpath)
+        self.pod = PVRPODLoader.open(inpath, zeroCopy=zerocopy)
         self.scene = self.pod.scene
         self.convert_meshes()
         self.convert_nodes()
@@ -108,6 +239,11 @@ class POD2GLB:
         print("[Part 06] Saving all data to a GLB format...")
         if xmlroot is not None:
             print("[WARNING] Due to constraints with GLTF, any Mask textures found will be attached as \"Emission\". It is up to you to reattach and correctly apply this map.")
+        if self.glb.dedupedBytes or self.glb.dedupedBufferViews:
+            print(f"[DEBUG] Deduplicated {self.glb.dedupedBytes} bytes of buffer data and {self.glb.dedupedBufferViews} bufferView(s).")
+        if meshopt:
+            (raw, encoded, seconds) = self.meshopt_stats
+            print(f"[DEBUG] meshopt compressed {raw} bytes of geometry to {encoded} bytes ({100 - 100 * encoded / max(raw, 1):.1f}% smaller) in {seconds:.3f}s.")
         self.glb.save(path)
         print("[FINISH!] Done!")
 
@@ -152,40 +288,132 @@ class POD2GLB:
         ret = False if not pvrtextool_exists else pvrtextool_path
         return ret
 
+    @staticmethod
+    def use_builtin_decoder():
+        return hasdecoder and texturedecoder != "external"
+
+    @staticmethod
+    # Returns the parsed PVRTexture if the built-in decoder can handle it, otherwise None.
+    def load_builtin_texture(input_file):
+        if not POD2GLB.use_builtin_decoder():
+            return None
+        try:
+            texture = PVRTexture.from_file(input_file)
+        except Exception as e:
+            print(f"[DEBUG] Built-in decoder could not read {input_file}: {e}. Falling back to PVRTexTool.")
+            return None
+        if texture.pixel_format not in supported_pixel_formats:
+            print(f"[DEBUG] Built-in decoder does not support {texture.pixel_format} ({input_file}). Falling back to PVRTexTool.")
+            return None
+        return texture
+
     @staticmethod
     def convert_texture_single(tool_path, input_file, output):
-        print(f"[DEBUG] Running PVRTexTool. Will be saved at {output}")
-        sp.run([
-            tool_path,
-            "-d", output,
-            "-i", input_file
-        ], check=True)  # Tool will output to console.
-
-        pvr_out_fname = f"{os.path.splitext(input_file)[0]}_Out.pvr"
-        print(f"[HOTFIX] Deleting temporary PVRTexTool _Out file if it exists: {pvr_out_fname}")
+        texture = POD2GLB.load_builtin_texture(input_file)
+        if texture is None and not tool_path:
+            print(f"[WARNING] Cannot convert {input_file}: the built-in decoder can't handle it and PVRTexTool wasn't found.")
+            return
+
+        if texturecache is not None:
+            backend = "pvr2image" if texture is not None else os.path.basename(tool_path)
+            key = texturecache.key(input_file, ("png", backend))
+            if texturecache.fetch(key, output):
+                print(f"[DEBUG] Texture cache hit for {input_file}. Will be saved at {output}")
+                return
+
+        if texture is not None:
+            print(f"[DEBUG] Decoding in-process. Will be saved at {output}")
+            pvrtexture_to_image(texture).save(output)
+        else:
+            print(f"[DEBUG] Running PVRTexTool. Will be saved at {output}")
+            sp.run([
+                tool_path,
+                "-d", output,
+                "-i", input_file
+            ], check=True)  # Tool will output to console.
+
+        if texturecache is not None:
+            texturecache.store(key, output)
+
+    @staticmethod
+    def remove_pvrtextool_out_file(input_file):
+        # Already includes the directory of input_file.
+        pvr_out_path = f"{os.path.splitext(input_file)[0]}_Out.pvr"
+        print(f"[HOTFIX] Deleting temporary PVRTexTool _Out file if it exists: {pvr_out_path}")
         try:
-            pvr_out_path = os.path.join(os.path.dirname(input_file), pvr_out_fname)
             os.remove(pvr_out_path)
         except FileNotFoundError:  # Ignore if that _Out file doesn't exist.
             pass
 
-    def add_textures_no_conversion(self):
-        for (textureIndex, texture) in enumerate(self.scene.textures):
-            print(f"[Part 04-1] Adding image {texture.getPath()}...")
-
+    def intern_sampler(self, magFilter, minFilter, wrapS, wrapT):
+        key = (magFilter, minFilter, wrapS, wrapT)
+        if key not in self.sampler_indices:
+            self.sampler_indices[key] = len(self.glb.samplers)
+            self.glb.addSampler({
+                "magFilter": magFilter,
+                "minFilter": minFilter,
+                "wrapS": wrapS,
+                "wrapT": wrapT
+            })
+        return self.sampler_indices[key]
+
+    def intern_image(self, path):
+        keys = [("path", os.path.realpath(path))]
+        if keys[0] in self.image_indices:
+            return self.image_indices[keys[0]]
+        if embedimage:
+            # The same PNG can also sit at several paths. Only worth
+            # hashing when embedding, as that is what ends up in the GLB.
+            with open(path, "rb") as f:
+                keys.append(("sha256", hashlib.file_digest(f, "sha256").hexdigest()))
+            if keys[1] in self.image_indices:
+                self.image_indices[keys[0]] = self.image_indices[keys[1]]
+                print(f"[DEBUG] {path} has the same contents as an image already added, reusing it.")
+                return self.image_indices[keys[1]]
+
+        image_index = len(self.glb.images)
+        if embedimage:
+            # Create a buffer view for the image. Only its size is
+            # needed now, the file is streamed into the GLB on save.
+            buffer_view_index = self.glb.addBufferView({
+                "buffer": 0,
+                "byteOffset": self.glb.addFile(path),  # buffer offset
+                "byteLength": os.path.getsize(path)
+            })
+            print(f"[DEBUG] Read image in, adding as buffer view index {buffer_view_index}")
+            # Add the image with bufferView and MIME type
             self.glb.addImage({
-                "uri": texture.getPath(dir="", ext=".png")
+                "bufferView": buffer_view_index,
+                "mimeType": "image/png",
+                "name": os.path.basename(path),
+                #"uri": path
             })
-            self.glb.addSampler({
-                "magFilter": self.GLENUM["GL_LINEAR"],
-                "minFilter": self.GLENUM["GL_LINEAR"],
-                "wrapS": self.GLENUM["GL_REPEAT"],
-                "wrapT": self.GLENUM["GL_REPEAT"]
+        else:  # Just use a link to the local image.
+            self.glb.addImage({
+                "uri": path
             })
+        for key in keys:
+            self.image_indices[key] = image_index
+        return image_index
+
+    def add_textures_no_conversion(self):
+        for texture in self.scene.textures:
+            print(f"[Part 04-1] Adding image {texture.getPath()}...")
+
+            # Not converted here, so never embedded; link by path.
+            uri = texture.getPath(dir="", ext=".png")
+            key = ("path", os.path.realpath(uri))
+            if key not in self.image_indices:
+                self.image_indices[key] = len(self.glb.images)
+                self.glb.addImage({
+                    "uri": uri
+                })
             self.glb.addTexture({
                 "name": texture.name,
-                "sampler": textureIndex,
-                "source": textureIndex
+                "sampler": self.intern_sampler(
+                    self.GLENUM["GL_LINEAR"], self.GLENUM["GL_LINEAR"],
+                    self.GLENUM["GL_REPEAT"], self.GLENUM["GL_REPEAT"]),
+                "source": self.image_indices[key]
             })
 
     def convert_textures(self, alphaarray=[], diffusearray=[]):
@@ -195,19 +423,49 @@ class POD2GLB:
         print("[Part 04] Converting textures...")
 
         pvrtextool_path = self.get_pvrtextool_path_and_exists()
-        if pvrtextool_path:  # Is PVRTexTool available?
+        if self.use_builtin_decoder():
+            print("[Part 04-2] Using the built-in texture decoder, PVRTexTool is only used for formats it can't decode.")
+        if pvrtextool_path or self.use_builtin_decoder():  # Is PVRTexTool (or the built-in decoder) available?
             dir_of_input = os.path.dirname(pathto)
             print("[Part 04-2] Now converting all images. Walking path:")
 
+            # Collect everything first so _Out files the tool writes
+            # while we're still walking are never picked up as inputs.
+            # Outputs are named after the file alone, so a .pvr with the
+            # same name in another subdirectory would be converted into
+            # the same PNG at the same time; only the first one is kept.
+            conversions = {}
             for root, dirs, files in os.walk(dir_of_input):
                 for file in files:
                     if not str(file).endswith(".pvr"):
                         continue  # Skip all non-pvr files.
                     # Input is a pvr file:
-                    output = os.path.join(os.path.dirname(pathout), os.path.basename(f"{os.path.splitext(file)[0]}.png"))
-                    print(f"[Part 04-2] Converting {file} to png...")
                     input_file = os.path.join(root, file)
-                    self.convert_texture_single(pvrtextool_path, input_file, output)
+                    output = os.path.join(os.path.dirname(pathout), os.path.basename(f"{os.path.splitext(file)[0]}.png"))
+                    key = os.path.normcase(output)
+                    if key in conversions:
+                        print(f"[WARNING] {input_file} would also be converted to {output}, skipping it in favour of {conversions[key][0]}.")
+                        continue
+                    conversions[key] = (input_file, output)
+            conversions = list(conversions.values())
+
+            # PVRTexTool runs as a subprocess, so threads are enough to
+            # overlap the conversions.
+            def convert(conversion):
+                (input_file, output) = conversion
+                print(f"[Part 04-2] Converting {os.path.basename(input_file)} to png...")
+                self.convert_texture_single(pvrtextool_path, input_file, output)
+
+            with ThreadPoolExecutor(max_workers=texturejobs) as executor:
+                # list() re-raises the first failed conversion (after all finish).
+                list(executor.map(convert, conversions))
+
+            # Only clean up once every conversion is done.
+            for (input_file, output) in conversions:
+                self.remove_pvrtextool_out_file(input_file)
+
+            if texturecache is not None:
+                print(f"[DEBUG] Texture cache: {texturecache.hits} hit(s), {texturecache.misses} miss(es).")
 
             # Apply alpha maps.
             if not diffusearray:  # array is empty?
@@ -227,6 +485,9 @@ class POD2GLB:
                         alpharesize = (dw, dh)
                         alphamap.resize(alpharesize)
                         diffusemap.putalpha(alphamap)
+                        # The PNG may be a hard link into the texture cache,
+                        # write a new file instead of overwriting it in place.
+                        os.remove(diffusepath)
                         diffusemap.save(diffusepath)
                         print("[DEBUG] Applied alpha map to diffuse map and re-saved.")
                     except FileNotFoundError as e:
@@ -241,7 +502,6 @@ class POD2GLB:
         # Enchanced XML sampler import support
         xmlmaterials = xmlroot.find("Materials")
         xmlmaterial = xmlmaterials.findall("Material")
-        textureIndex = 0
 
         # Albedo textures that need conversion:
         diffusearray = []  # Initialize and fill later: vv
@@ -289,40 +549,13 @@ class POD2GLB:
 
                 print(f"[Part 04-1] Adding image {texture["name"]}, path {texture["path"]}...")
 
-                if embedimage:
-                    with open(texture["path"], "rb") as img_file:
-                        image_data = img_file.read()
-                    # Create a buffer view for the image
-                    buffer_view_index = self.glb.addBufferView({
-                        "buffer": 0,
-                        "byteOffset": self.glb.addData(image_data),  # buffer offset
-                        "byteLength": len(image_data)
-                    })
-                    print(f"[DEBUG] Read image in, adding as buffer view index {buffer_view_index}")
-                    # Add the image with bufferView and MIME type
-                    self.glb.addImage({
-                        "bufferView": buffer_view_index,
-                        "mimeType": "image/png",
-                        "name": os.path.basename(texture["path"]),
-                        #"uri": texture["path"]
-                    })
-                else:  # Just use a link to the local image.
-                    self.glb.addImage({
-                        "uri": texture["path"]
-                    })
-
-                self.glb.addSampler({
-                    "magFilter": magFilter,
-                    "minFilter": minFilter,
-                    "wrapS": wrapS,
-                    "wrapT": wrapT
-                })
+                # Materials refer to textures in sampler order, so there is
+                # still one texture per sampler, sharing images and samplers.
                 self.glb.addTexture({
                     "name": texture["name"],
-                    "sampler": textureIndex,
-                    "source": textureIndex
+                    "sampler": self.intern_sampler(magFilter, minFilter, wrapS, wrapT),
+                    "source": self.intern_image(texture["path"])
                 })
-                textureIndex += 1
 
     def convert_materials(self):
         print("[Part 05] Converting materials...")
@@ -428,129 +661,587 @@ class POD2GLB:
 
     def convert_nodes(self):
         print("[Part 03] Converting nodes...")
+        # Child nodes carrying quantized meshes, added after all POD nodes
+        # so the POD node indices stay valid.
+        dequantize_nodes = []
+        self.scene_graph = self.scene.BuildSceneGraph()
+        childLists = [self.scene_graph.Children(nodeIndex).tolist() for nodeIndex in range(self.scene_graph.numNodes)]
+        roots = set(self.scene_graph.roots.tolist())
+        meshIndices = self.scene_graph.meshIndices.tolist()
+        tracks = self.gather_node_tracks()
+        world = self.rest_world_matrices(tracks) if self.mesh_joints else None
         for (nodeIndex, node) in enumerate(self.scene.nodes):
-            children = [i for (i, node) in enumerate(self.scene.nodes) if node.parentIndex == nodeIndex]
+            children = childLists[nodeIndex]
 
-            nodeEntry = {
-                "name": node.name,
-                "translation": node.animation.positions.tolist(),
-                "scale": node.animation.scales[0:3].tolist(),
-                "rotation": node.animation.rotations[0:4].tolist(),
-            }
+            # the rest transform is the first frame of the animation
+            nodeEntry = {"name": node.name}
+            if nodeIndex in tracks:
+                for (path, values) in tracks[nodeIndex].items():
+                    nodeEntry[path] = values[0].tolist()
+            else:
+                for (path, data, size) in (("translation", node.animation.positions, 3),
+                                           ("rotation", node.animation.rotations, 4),
+                                           ("scale", node.animation.scales, 3)):
+                    if data is not None and len(data) >= size:
+                        nodeEntry[path] = data[0:size].tolist()
 
             if children:  # skip if it is empty array
                 nodeEntry["children"] = children
 
             # if the node has a mesh index
-            if node.index != -1:
+            meshIndex = meshIndices[nodeIndex]
+            if meshIndex != -1:
                 print(f"[Part 03-1] {node.name} has a mesh index.")
-                meshIndex = node.index
-                nodeEntry["mesh"] = meshIndex
+                if meshIndex in self.mesh_dequantize:
+                    # The dequantization transform must not apply to
+                    # this node's children, so it gets a node of its own.
+                    nodeEntry.setdefault("children", []).append(len(self.scene.nodes) + len(dequantize_nodes))
+                    dequantize_nodes.append({
+                        "name": f"{node.name}_mesh",
+                        "mesh": meshIndex,
+                        **self.mesh_dequantize[meshIndex]
+                    })
+                else:
+                    nodeEntry["mesh"] = meshIndex
+                if meshIndex in self.mesh_joints:
+                    nodeEntry["skin"] = self.add_skin(nodeIndex, self.mesh_joints[meshIndex], world)
                 if node.materialIndex != -1:
                     self.glb.meshes[meshIndex]["primitives"][0]["material"] = node.materialIndex
 
-            # if the node index is -1 it is a root node
-            if node.parentIndex == -1:
+            # nodes without a (valid) parent are root nodes
+            if nodeIndex in roots:
                 print(f"[Part 03-1] {node.name} is a root node.")
                 self.glb.addRootNodeIndex(nodeIndex)
             print(f"[Part 03-2] Now adding {node.name}.")
             self.glb.addNode(nodeEntry)
-            # To convert or not to convert
-            if node.animation.matrices is not None:
-                print(f"Converting matrix animation data for: {node.name}")
-                print("Currently animation porting is not available at this time, sorry :(")
-                print(node.animation.matrices)
-                # keyframes = []
-                # matrix = node.animation.matrices.tolist()
-                # for x in range(len(matrix)):
-                #     if x != 15 or:
-                #        rotationX = PVRMaths.PVRMatrix4x4RX3D()
+
+        for nodeEntry in dequantize_nodes:
+            self.glb.addNode(nodeEntry)
+        self.convert_animations(tracks)
+
+    def gather_node_tracks(self):
+        # Local transform of every node per frame: node index ->
+        # {"translation": (frames, 3), "rotation": (frames, 4), "scale":
+        # (frames, 3)}. Matrix tracks of all nodes are decomposed together
+        # in one batch.
+        numFrames = self.scene.numFrames
+        tracks = {}
+        matrixNodes = []
+        matrixFrames = []
+        for (nodeIndex, node) in enumerate(self.scene.nodes):
+            animation = node.animation
+            if animation.matrices is not None and len(animation.matrices) >= 16:
+                matrixNodes.append(nodeIndex)
+                matrixFrames.append(GLBAnimation.gatherFrames(animation.matrices, animation.matrixIndices, 16, numFrames))
+                continue
+            track = {}
+            # POD scales are 7 floats: the scale and a stretch rotation
+            for (path, data, indices, size, width) in (("translation", animation.positions, animation.positionIndices, 3, 3),
+                                                       ("rotation", animation.rotations, animation.rotationIndices, 4, 4),
+                                                       ("scale", animation.scales, animation.scaleIndices, 7, 3)):
+                if data is not None and len(data) >= width:
+                    track[path] = GLBAnimation.gatherFrames(data, indices, size if len(data) >= size else width, numFrames)[:, :width]
+            if "rotation" in track:
+                track["rotation"] = GLBAnimation.alignQuaternions(track["rotation"])
+            tracks[nodeIndex] = track
+
+        if matrixFrames:
+            counts = [len(frames) for frames in matrixFrames]
+            starts = np.cumsum(counts) - counts
+            (translations, rotations, scales) = GLBAnimation.decomposeMatrices(np.concatenate(matrixFrames))
+            rotations = GLBAnimation.alignQuaternions(rotations, starts)
+            for (nodeIndex, start, count) in zip(matrixNodes, starts, counts):
+                tracks[nodeIndex] = {
+                    "translation": translations[start:start + count],
+                    "rotation": rotations[start:start + count],
+                    "scale": scales[start:start + count],
+                }
+            print(f"[DEBUG] Decomposed {sum(counts)} animation matrices of {len(matrixNodes)} node(s).")
+        return tracks
+
+    def rest_world_matrices(self, tracks):
+        # (numNodes, 4, 4) world matrices of the nodes' rest transforms (the
+        # first frame), as written to the glTF nodes.
+        numNodes = len(self.scene.nodes)
+        translations = np.zeros((numNodes, 3))
+        rotations = np.tile([0.0, 0.0, 0.0, 1.0], (numNodes, 1))
+        scales = np.ones((numNodes, 3))
+        rest = {"translation": translations, "rotation": rotations, "scale": scales}
+        for (nodeIndex, track) in tracks.items():
+            for (path, values) in track.items():
+                rest[path][nodeIndex] = values[0]
+        local = GLBAnimation.composeMatrices(translations, rotations, scales)
+
+        # one batched product per depth of the hierarchy, parents first
+        graph = self.scene_graph
+        world = local.copy()
+        for level in list(graph.Levels())[1:]:
+            world[level] = world[graph.parentIndices[level]] @ local[level]
+        return world
+
+    def add_skin(self, nodeIndex, joints, world):
+        # A joint's inverse bind matrix takes the mesh from where its node
+        # put it in the rest pose into the joint's space, as the POD SDK
+        # does with frame 0.
+        inverseBindMatrices = np.linalg.inv(world[joints]) @ world[nodeIndex]
+        skinIndex = self.glb.addSkin({
+            "joints": joints,
+            "inverseBindMatrices": self.add_float_accessor(inverseBindMatrices.transpose(0, 2, 1).reshape(-1, 16), "MAT4"),
+        })
+        print(f"[Part 03-1] {self.scene.nodes[nodeIndex].name} is skinned to {len(joints)} joint(s).")
+        return skinIndex
+
+    def add_float_accessor(self, values, accessorType):
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        bufferView = self.glb.addBufferView({
+            "buffer": 0,
+            "byteOffset": self.glb.addData(values.tobytes()),
+            "byteLength": values.nbytes,
+        })
+        return self.glb.addAccessor({
+            "bufferView": bufferView,
+            "byteOffset": 0,
+            "componentType": 5126,  # FLOAT
+            "count": len(values),
+            "type": accessorType,
+            "min": values.min(axis=0).reshape(-1).tolist(),
+            "max": values.max(axis=0).reshape(-1).tolist(),
+        })
+
+    def reduce_animation_tracks(self, channels):
+        # Drops the keys interpolation reproduces within animationtolerance,
+        # for all channels at once: translations and scales together with
+        # linear interpolation, rotations with slerp. Returns the kept frame
+        # numbers per channel, None for channels that are constant (the
+        # node's rest transform already holds their value).
+        keyframes = [np.arange(len(values)) for (nodeIndex, path, values) in channels]
+        if animationtolerance < 0:
+            return keyframes
+        for spherical in (False, True):
+            group = [i for (i, (nodeIndex, path, values)) in enumerate(channels) if (path == "rotation") == spherical]
+            if not group:
+                continue
+            stacked = np.concatenate([channels[i][2] for i in group]).astype(np.float64)
+            lengths = [len(channels[i][2]) for i in group]
+            starts = np.cumsum(lengths) - lengths
+            constant = GLBAnimation.constantTracks(stacked, starts, animationtolerance)
+            kept = GLBAnimation.reduceKeyframes(stacked, starts, animationtolerance, spherical)
+            for (i, start, length, isConstant) in zip(group, starts, lengths, constant):
+                keyframes[i] = None if isConstant else np.flatnonzero(kept[start:start + length])
+        before = sum(len(values) for (nodeIndex, path, values) in channels)
+        after = sum(len(frames) for frames in keyframes if frames is not None)
+        print(f"[DEBUG] Reduced animation from {before} to {after} keyframes ({sum(frames is None for frames in keyframes)} constant channel(s) dropped, tolerance {animationtolerance}).")
+        return keyframes
+
+    def convert_animations(self, tracks):
+        # One glTF animation holding a linear channel per animated track.
+        fps = self.scene.fps or 30
+        channels = [(nodeIndex, path, values) for (nodeIndex, track) in tracks.items()
+                    for (path, values) in track.items() if len(values) > 1]
+        if not channels:
+            return
+        keyframes = self.reduce_animation_tracks(channels)
+
+        timeAccessors = {}
+        samplers = []
+        gltfChannels = []
+        for ((nodeIndex, path, values), frames) in zip(channels, keyframes):
+            if frames is None:
+                continue
+            key = frames.tobytes()
+            if key not in timeAccessors:
+                timeAccessors[key] = self.add_float_accessor(frames / fps, "SCALAR")
+            samplers.append({
+                "input": timeAccessors[key],
+                "output": self.add_float_accessor(values[frames], "VEC4" if path == "rotation" else "VEC3"),
+                "interpolation": "LINEAR",
+            })
+            gltfChannels.append({
+                "sampler": len(samplers) - 1,
+                "target": {"node": nodeIndex, "path": path},
+            })
+        if gltfChannels:
+            print(f"[Part 03-3] Adding animation with {len(gltfChannels)} channel(s) at {fps} fps.")
+            self.glb.addAnimation({
+                "name": "Animation",
+                "samplers": samplers,
+                "channels": gltfChannels,
+            })
+
+    def optimize_mesh(self, meshIndex, mesh):
+        # Reorders the mesh in place: triangles for vertex cache hits, then
+        # every vertex buffer in the order the triangles use the vertices.
+        numVertices = mesh.primitiveData["numVertices"]
+        strides = {element["dataIndex"]: self.element_stride(element) for element in mesh.vertexElements.values()}
+        indices = np.frombuffer(mesh.faces["data"], dtype=np.uint32 if mesh.faces["data"].itemsize == 4 else np.uint16)
+        if len(indices) % 3 or len(indices) == 0 or indices.max() >= numVertices \
+                or any(not 0 <= dataIndex < len(mesh.vertexElementData) for dataIndex in strides) \
+                or any(memoryview(mesh.vertexElementData[dataIndex]).nbytes != numVertices * stride for (dataIndex, stride) in strides.items()):
+            print(f"[DEBUG] Mesh {meshIndex} is not a triangle list with one vertex per buffer entry, not optimizing it.")
+            return
+
+        (before, beforeATVR) = GLBOptimize.simulateCache(indices)
+        indices = GLBOptimize.optimizeVertexCache(indices, numVertices)
+        (indices, newToOld) = GLBOptimize.optimizeVertexFetch(indices, numVertices)
+        (after, afterATVR) = GLBOptimize.simulateCache(indices)
+        print(f"[DEBUG] Optimized mesh {meshIndex}: ACMR {before:.3f} -> {after:.3f}, ATVR {beforeATVR:.3f} -> {afterATVR:.3f}")
+
+        for (dataIndex, stride) in strides.items():
+            vertices = np.frombuffer(mesh.vertexElementData[dataIndex], dtype=np.uint8).reshape(numVertices, stride)
+            mesh.vertexElementData[dataIndex] = vertices[newToOld].reshape(-1)
+        mesh.faces["data"] = indices
+
+    def mesh_triangles(self, meshIndex, mesh):
+        # (numTriangles, 3) vertex indices in the order of the POD, strips
+        # included (degenerate triangles too, so POD triangle offsets stay
+        # valid). Meshes without an index list use their vertices in order.
+        indices = mesh.faces["data"]
+        if indices is None or len(indices) == 0:
+            indices = np.arange(mesh.primitiveData["numVertices"], dtype=np.uint32)
+        else:
+            indices = np.frombuffer(indices, dtype=np.uint32 if mesh.faces["indexType"] == EPVRMesh.FaceData.e32Bit else np.uint16)
+        if mesh.primitiveData["numStrips"] == 0:
+            return indices[:len(indices) - len(indices) % 3].reshape(-1, 3)
+
+        # triangles per strip, each strip taking 2 more indices than that
+        stripLengths = mesh.primitiveData["stripLengths"]
+        if stripLengths is None or len(stripLengths) == 0:
+            stripLengths = [max(len(indices) - 2, 0)]
+        stripLengths = np.asarray(stripLengths, dtype=np.int64)
+        stripStarts = np.concatenate(([0], np.cumsum(stripLengths + 2)[:-1]))
+        if stripStarts[-1] + stripLengths[-1] + 2 > len(indices):
+            raise ValueError(f"Strips of mesh {meshIndex} need more indices than the mesh has.")
+
+        # nth triangle of a strip starts at index n of it; odd ones swap
+        # their first two corners
+        firstTriangles = np.cumsum(stripLengths) - stripLengths
+        n = np.arange(int(stripLengths.sum())) - np.repeat(firstTriangles, stripLengths)
+        base = np.repeat(stripStarts, stripLengths) + n
+        odd = n & 1
+        return np.stack((indices[base + odd], indices[base + 1 - odd], indices[base + 2]), axis=1)
+
+    def remap_joints(self, meshIndex, mesh):
+        # POD skinned meshes are split into bone batches of up to boneMax
+        # bones, and JOINTS_0 indexes the bone list of the vertex's batch,
+        # each batch owning a range of triangles. glTF indexes the joint
+        # list of the skin, one for the whole mesh. The remapped indices go
+        # into a buffer of their own. Returns the joints (node indices).
+        batches = mesh.boneBatches
+        numBatches = batches["count"]
+        numVertices = mesh.primitiveData["numVertices"]
+        boneMax = batches["boneMax"]
+        bones = np.asarray(batches["batches"], dtype=np.int64)[:numBatches * boneMax].reshape(numBatches, boneMax)
+        boneCounts = np.asarray(batches["boneCounts"], dtype=np.int64)[:numBatches]
+        triangles = self.mesh_triangles(meshIndex, mesh)
+        offsets = np.append(np.asarray(batches["offsets"], dtype=np.int64)[:numBatches], len(triangles)).clip(0, len(triangles))
+
+        # batch of every vertex, from the triangles that use it
+        triangleBatches = np.repeat(np.arange(numBatches), np.diff(offsets).clip(0))
+        triangles = triangles[:len(triangleBatches)]
+        vertexBatches = np.zeros(numVertices, dtype=np.int64)
+        vertexBatches[triangles.ravel()] = np.repeat(triangleBatches, 3)
+        shared = int((vertexBatches[triangles] != triangleBatches[:, None]).any(axis=1).sum())
+        if shared:
+            print(f"[WARNING] {shared} triangle(s) of mesh {meshIndex} use vertices of another bone batch, their skinning may be off.")
+
+        local = mesh.attribute("JOINTS_0").astype(np.int64)
+        outside = local >= boneCounts[vertexBatches][:, None]
+        if outside.any():
+            print(f"[WARNING] Mesh {meshIndex} has {int(outside.sum())} joint index(es) past the bones of their batch, using the batch's first bone.")
+            local[outside] = 0
+        nodes = bones[vertexBatches[:, None], local]
+
+        used = np.arange(boneMax)[None, :] < boneCounts[:, None]
+        joints = np.unique(bones[used])
+        lookup = np.zeros(int(joints.max()) + 1 if len(joints) else 1, dtype=np.int64)
+        lookup[joints] = np.arange(len(joints))
+        (dtype, dataType) = (np.uint8, EPVRMesh.VertexData.eUnsignedByte) if len(joints) <= 256 \
+            else (np.uint16, EPVRMesh.VertexData.eUnsignedShort)
+        remapped = lookup[nodes].astype(dtype)
+
+        element = mesh.vertexElements["JOINTS_0"]
+        mesh.vertexElements["JOINTS_0"] = {
+            **element,
+            "dataType": dataType,
+            "stride": remapped.shape[1] * remapped.itemsize,
+            "offset": 0,
+            "dataIndex": mesh.AddData(remapped.reshape(-1)),
+        }
+        print(f"[DEBUG] Remapped joints of mesh {meshIndex} from {numBatches} bone batch(es) to {len(joints)} skin joints.")
+        return joints.tolist()
+
+    def expand_strips(self, meshIndex, mesh):
+        # Turns the mesh's triangle strips (indexed, or implicit vertex
+        # order when there is no index list) into one triangle list, in
+        # place. Odd triangles are flipped to keep the winding and
+        # degenerate (strip joining) triangles are dropped.
+        triangles = self.mesh_triangles(meshIndex, mesh)
+        degenerate = (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | (triangles[:, 0] == triangles[:, 2])
+        triangles = triangles[~degenerate]
+
+        print(f"[DEBUG] Expanded {len(mesh.primitiveData["stripLengths"] or [0])} strip(s) of mesh {meshIndex} into {len(triangles)} triangles ({int(degenerate.sum())} degenerate dropped).")
+        mesh.faces["data"] = triangles.ravel()
+        mesh.faces["indexType"] = EPVRMesh.FaceData.e32Bit if triangles.dtype == np.uint32 else EPVRMesh.FaceData.e16Bit
+        mesh.primitiveData["numFaces"] = len(triangles)
+        mesh.primitiveData["numStrips"] = 0
+        mesh.primitiveData["stripLengths"] = None
+        mesh.primitiveData["primitiveType"] = EPVRMesh.eIndexedTriangleList
+
+    def narrow_indices(self, meshIndex, mesh):
+        # Smallest index type that holds the largest index. The maximum
+        # value of each type is reserved for primitive restart in glTF.
+        indices = mesh.faces["data"]
+        if len(indices) == 0:
+            return indices
+        dtype = np.uint32 if mesh.faces["indexType"] == EPVRMesh.FaceData.e32Bit else np.uint16
+        data = np.frombuffer(indices, dtype=dtype)
+        maxIndex = int(data.max())
+        # the meshopt index codec only takes 16 and 32-bit indices
+        for narrowed in ((np.uint16, np.uint32) if meshopt else (np.uint8, np.uint16, np.uint32)):
+            if maxIndex < np.iinfo(narrowed).max:
+                break
+        else:
+            raise ValueError(f"Mesh {meshIndex} uses vertex index {maxIndex}, which glTF can't store.")
+        if narrowed != dtype:
+            print(f"[DEBUG] Storing indices of mesh {meshIndex} as {np.dtype(narrowed)} instead of {np.dtype(dtype)} (largest index {maxIndex}).")
+            data = data.astype(narrowed)
+        return data
+
+    def add_meshopt_buffer_view(self, data, bufferView, byteStride, mode, count):
+        start = time.perf_counter()
+        if mode == "TRIANGLES":
+            encoded = GLBMeshopt.encodeIndexBuffer(memoryview(data).cast("B").cast("H" if byteStride == 2 else "I"))
+        else:
+            encoded = GLBMeshopt.encodeVertexBuffer(data, count, byteStride)
+        self.meshopt_stats[0] += bufferView["byteLength"]
+        self.meshopt_stats[1] += len(encoded)
+        self.meshopt_stats[2] += time.perf_counter() - start
+        return self.glb.addMeshoptBufferView(bufferView, data, encoded, byteStride, mode, count, fallback=meshoptfallback)
+
+    def add_index_buffer_view(self, indices):
+        byteLength = len(indices) * indices.itemsize
+        if meshopt and indices.itemsize in (2, 4) and len(indices) % 3 == 0:
+            return self.add_meshopt_buffer_view(indices, {
+                "byteLength": byteLength,
+                "target": 34963     # ELEMENT_ARRAY_BUFFER
+            }, indices.itemsize, "TRIANGLES", len(indices))
+        return self.glb.addBufferView({
+            "buffer": 0,
+            "byteOffset": self.glb.addData(indices.tobytes()),
+            "byteLength": byteLength,
+            "target": 34963     # ELEMENT_ARRAY_BUFFER
+        })
+
+    def add_vertex_buffer_view(self, data, stride, numVertices):
+        byteLength = memoryview(data).nbytes
+        # the vertex codec needs a stride of a multiple of 4, up to 256
+        if meshopt and stride % 4 == 0 and stride <= 256 and byteLength == stride * numVertices:
+            return self.add_meshopt_buffer_view(data, {
+                "byteStride": stride,
+                "target": 34962,  # ARRAY_BUFFER
+                "byteLength": byteLength,
+            }, stride, "ATTRIBUTES", numVertices)
+        return self.glb.addBufferView({
+            "buffer": 0,
+            "byteOffset": self.glb.addData(data),
+            "byteStride": stride,
+            "target": 34962,  # ARRAY_BUFFER
+            "byteLength": byteLength,
+        })
+
+    def element_types(self, element):
+        # (glTF accessor type, componentType) of a POD vertex element
+        accessorType = self.num_components_to_accessor_types \
+            .get(element["numComponents"], None)
+        if accessorType is None:
+            raise NotImplementedError(f"Don't have glTF accessor data type for number of components: {element["numComponents"]}")
+
+        componentType = self.vertex_data_type_to_accessor_data_types \
+            .get(element["dataType"], None)
+
+        if componentType is None:
+            raise NotImplementedError(f"Don't have glTF accessor type for corresponding EPVR vertex data type: {element["dataType"]}")
+        return (accessorType, componentType)
+
+    def element_stride(self, element):
+        # non-interleaved elements may leave the stride at 0 (tightly packed)
+        (accessorType, componentType) = self.element_types(element)
+        return element["stride"] or element["numComponents"] * self.accessor_data_type_sizes[componentType]
+
+    def vertex_sources(self, meshIndex, mesh, layout):
+        # The exported vertex elements and the buffers holding them:
+        # ({dataIndex: (data, stride)}, {name: element}). POD meshes keep
+        # vertex data in one interleaved buffer or in one buffer per
+        # element. layout "source" exports those buffers as they are,
+        # "interleave" copies all elements into one new buffer.
+        numVertices = mesh.primitiveData["numVertices"]
+        elements = {}
+        for (name, element) in mesh.vertexElements.items():
+            if name == "COLOR_0":
+                # COLOR_0 is is R8G8B8A8_UNORM
+                # it is not 4 floats, so adding it
+                # will not work and cause "accessor
+                # does not fit referenced bufferView..."
+                print("[DEBUG] Model has COLOR_0 attribute. This is not supported, so it will be skipped.")
+                continue
+            if not 0 <= element["dataIndex"] < len(mesh.vertexElementData):
+                print(f"[WARNING] {name} of mesh {meshIndex} has no vertex data, skipping it.")
+                continue
+            elements[name] = element
+
+        sources = {}
+        for element in elements.values():
+            sources[element["dataIndex"]] = (mesh.vertexElementData[element["dataIndex"]], self.element_stride(element))
+
+        # glTF wants vertex elements and strides 4-byte aligned
+        aligned = all(stride % 4 == 0 for (data, stride) in sources.values()) \
+            and all(element["offset"] % 4 == 0 for element in elements.values())
+        if layout == "source" and not aligned:
+            print(f"[DEBUG] Vertex data of mesh {meshIndex} is not 4-byte aligned, interleaving it.")
+            layout = "interleave"
+        if layout == "source" or not elements:
+            return (sources, elements)
+
+        columns = [mesh.attribute(name) for name in elements]
+        (vertices, stride, offsets) = GLBQuantize.interleave(columns, numVertices)
+        interleaved = {}
+        for ((name, element), offset) in zip(elements.items(), offsets):
+            interleaved[name] = {**element, "dataIndex": 0, "offset": offset, "stride": stride}
+        return ({0: (vertices.reshape(-1), stride)}, interleaved)
+
+    def convert_vertices(self, meshIndex, mesh):
+        attributes = {}
+        numVertices = mesh.primitiveData["numVertices"]
+
+        # vertex buffer views, one per source buffer
+        (sources, vertexElements) = self.vertex_sources(meshIndex, mesh, vertexlayout)
+        bounds = mesh.attributeBounds()
+        vertexBufferViews = {}
+        for (dataIndex, (data, stride)) in sources.items():
+            vertexBufferViews[dataIndex] = self.add_vertex_buffer_view(data, stride, numVertices)
+            print(f"[DEBUG] Creating bufferView for mesh {meshIndex}, length: {memoryview(data).nbytes}")
+
+        for (name, element) in vertexElements.items():
+            (accessorType, componentType) = self.element_types(element)
+
+            accessor_data = {
+                "bufferView": vertexBufferViews[element["dataIndex"]],
+                "byteOffset": element["offset"],
+                # https://github.com/KhronosGroup/glTF/blob/master/specification/2.0/README.md#accessor-element-size
+                "componentType": componentType,
+                "count": numVertices,
+                "type": accessorType
+            }
+
+            # bounds of the stored values, normalized or not
+            if name in bounds:
+                accessor_data["min"] = bounds[name][0].tolist()
+                accessor_data["max"] = bounds[name][1].tolist()
+
+            accessorIndex = self.glb.addAccessor(accessor_data)
+            print(f"[DEBUG] Creating accessor {accessorIndex} for attribute {name}")
+            attributes[name] = accessorIndex
+        return attributes
+
+    def convert_vertices_quantized(self, meshIndex, mesh):
+        # KHR_mesh_quantization: POSITION becomes SHORT (dequantized by the
+        # node transform), NORMAL/TANGENT normalized BYTE and TEXCOORD_n
+        # normalized UNSIGNED_SHORT. Everything else is copied unchanged
+        # into a new, smaller interleaved vertex buffer.
+        self.glb.addExtension("KHR_mesh_quantization", required=True)
+        numVertices = mesh.primitiveData["numVertices"]
+        (sources, vertexElements) = self.vertex_sources(meshIndex, mesh, "source")
+        # Skinned vertices ignore the node transform, so positions stay float.
+        skinned = "JOINTS_0" in vertexElements
+        bounds = mesh.attributeBounds()
+
+        names = []
+        columns = []
+        accessors = []
+        for (name, element) in vertexElements.items():
+            (accessorType, componentType) = self.element_types(element)
+            source = mesh.attribute(name)
+            column = source
+            accessor_data = {}
+            error = None
+            if componentType == 5126 and numVertices:
+                if name == "POSITION" and not skinned:
+                    (column, translation, scale, error) = GLBQuantize.quantizePositions(source, bounds[name])
+                    self.mesh_dequantize[meshIndex] = {
+                        "translation": translation.tolist(),
+                        "scale": scale.tolist()
+                    }
+                elif name in ("NORMAL", "TANGENT"):
+                    (column, error) = GLBQuantize.quantizeNormalized(source, np.int8)
+                    accessor_data["normalized"] = True
+                elif name.startswith("TEXCOORD_") and bounds[name][0].min() >= 0 and bounds[name][1].max() <= 1:
+                    (column, error) = GLBQuantize.quantizeNormalized(source, np.uint16)
+                    accessor_data["normalized"] = True
+                elif name.startswith("TEXCOORD_"):
+                    print(f"[DEBUG] {name} of mesh {meshIndex} is outside 0-1, keeping it as float.")
+                elif name == "POSITION":
+                    print(f"[DEBUG] Mesh {meshIndex} is skinned, keeping POSITION as float.")
+
+            if error is not None:
+                print(f"[DEBUG] Quantized {name} of mesh {meshIndex} to {column.dtype}, max error {error:.6g}.")
+
+            if column is source and name in bounds:
+                accessor_data["min"] = bounds[name][0].tolist()
+                accessor_data["max"] = bounds[name][1].tolist()
+            elif numVertices:
+                accessor_data["min"] = column.min(axis=0).tolist()
+                accessor_data["max"] = column.max(axis=0).tolist()
+
+            names.append(name)
+            columns.append(column)
+            accessors.append((GLBQuantize.dtypeComponentTypes[column.dtype], accessorType, accessor_data))
+
+        (vertices, stride, offsets) = GLBQuantize.interleave(columns, numVertices)
+        vertexBufferView = self.add_vertex_buffer_view(vertices, stride, numVertices)
+        original = sum(memoryview(data).nbytes for (data, stride) in sources.values())
+        print(f"[DEBUG] Creating quantized bufferView for mesh {meshIndex}, length: {vertices.nbytes} (was {original}, {100 - 100 * vertices.nbytes / max(original, 1):.1f}% smaller)")
+
+        attributes = {}
+        for (name, offset, (componentType, accessorType, extra)) in zip(names, offsets, accessors):
+            accessorIndex = self.glb.addAccessor({
+                "bufferView": vertexBufferView,
+                "byteOffset": offset,
+                "componentType": componentType,
+                "count": numVertices,
+                "type": accessorType,
+                **extra
+            })
+            print(f"[DEBUG] Creating accessor {accessorIndex} for attribute {name}")
+            attributes[name] = accessorIndex
+        return attributes
 
     def convert_meshes(self):
         print("[Part 02] Converting meshes...")
         for (meshIndex, mesh) in enumerate(self.scene.meshes):
-            attributes = {}
+            # before anything reorders the triangles the batches refer to
+            if "JOINTS_0" in mesh.vertexElements and mesh.boneBatches["count"]:
+                self.mesh_joints[meshIndex] = self.remap_joints(meshIndex, mesh)
+            if mesh.primitiveData["numStrips"] > 0:
+                self.expand_strips(meshIndex, mesh)
             numFaces = mesh.primitiveData["numFaces"]
-            numVertices = mesh.primitiveData["numVertices"]
+            if optimizemeshes:
+                self.optimize_mesh(meshIndex, mesh)
 
             # face index buffer view
-            indices = mesh.faces["data"]
+            indices = self.narrow_indices(meshIndex, mesh)
             indicesAccessorIndex = self.glb.addAccessor({
-                "bufferView": self.glb.addBufferView({
-                    "buffer": 0,
-                    "byteOffset": self.glb.addData(indices.tobytes()),
-                    "byteLength": len(indices) * indices.itemsize,
-                    "target": 34963     # ELEMENT_ARRAY_BUFFER
-                }),
+                "bufferView": self.add_index_buffer_view(indices),
                 "byteOffset": 0,
                 # https://github.com/KhronosGroup/glTF/blob/master/specification/2.0/README.md#accessor-element-size
-                "componentType": 5123,  # UNSIGNED_SHORT
+                "componentType": self.index_size_to_accessor_data_types[indices.itemsize],
                 "count": numFaces * 3,
                 "type": "SCALAR"
             })
 
-            # vertex buffer view
-            vertexElements = mesh.vertexElements
-
-            # NOTE: Assuming that it's all in one vertex buffer...!!!
-            vertexBufferView = self.glb.addBufferView({
-                "buffer": 0,
-                "byteOffset": self.glb.addData(mesh.vertexElementData[0]),
-                "byteStride": vertexElements["POSITION"]["stride"],
-                "target": 34962,  # ARRAY_BUFFER
-                "byteLength": len(mesh.vertexElementData[0]),
-            })
-            print(f"[DEBUG] Creating bufferView for mesh {meshIndex}, length: {len(mesh.vertexElementData[0])}")
-
-            for name in vertexElements:
-                if name == "COLOR_0":
-                    # COLOR_0 is is R8G8B8A8_UNORM
-                    # it is not 4 floats, so adding it
-                    # will not work and cause "accessor
-                    # does not fit referenced bufferView..."
-                    print("[DEBUG] Model has COLOR_0 attribute. This is not supported, so it will be skipped.")
-                    continue
-
-                element = vertexElements[name]
-                accessorType = self.num_components_to_accessor_types \
-                    .get(element["numComponents"], None)
-                if accessorType is None:
-                    raise NotImplementedError(f"Don't have glTF accessor data type for number of components: {element["numComponents"]}")
-
-                componentType = self.vertex_data_type_to_accessor_data_types \
-                    .get(element["dataType"], None)
-
-                if componentType is None:
-                    raise NotImplementedError(f"Don't have glTF accessor type for corresponding EPVR vertex data type: {element["dataType"]}")
-
-                accessor_data = {
-                    "bufferView": vertexBufferView,
-                    "byteOffset": element["offset"],
-                    # https://github.com/KhronosGroup/glTF/blob/master/specification/2.0/README.md#accessor-element-size
-                    "componentType": componentType,
-                    "count": numVertices,
-                    "type": accessorType
-                }
-
-                # Make bounding box for position.
-                if name == "POSITION" and hasnumpy:
-                    # Import single vertex buffer.
-                    data = np.frombuffer(mesh.vertexElementData[0], dtype=np.float32)
-                    # 4 = sizeof(float)
-                    stride = int(vertexElements["POSITION"]["stride"] / 4)
-                    assert data.size % stride == 0, "oh no! the data is not divisible by the stride... did we assume "
-                    # Reshape into (-1, stride) to process the interleaved data
-                    data = data.reshape(-1, stride)
-                    positions = data[:, :3]
-
-                    # get min and max, convert np.array
-                    # float32 to list of floats
-                    accessor_data["min"] = [float(x) for x in positions.min(axis=0)]
-                    accessor_data["max"] = [float(x) for x in positions.max(axis=0)]
-
-                accessorIndex = self.glb.addAccessor(accessor_data)
-                print(f"[DEBUG] Creating accessor {accessorIndex} for attribute {name}")
-                attributes[name] = accessorIndex
+            if quantize:
+                attributes = self.convert_vertices_quantized(meshIndex, mesh)
+            else:
+                attributes = self.convert_vertices(meshIndex, mesh)
 
             # POD meshes only have one primitive?
             # https://github.com/KhronosGroup/glTF/blob/master/specification/2.0/README.md#primitive
@@ -600,63 +1291,226 @@ def convert_to_fbx(file):  # Using Noesis/--fix-armature
     else:
         print("[FIX - ERROR!] Fix will NOT continue. You don't have Noesis downloaded or didn't put it in the same directory as the converter (Or you misspelled the NOESIS_PATH variable if you tried to override the paths!). To download it, go to https://www.richwhitehouse.com/index.php?content=inc_projects.php&showproject=91.")
 
+def apply_options(options):
+    # Sets the module-level settings. Batch workers call this so every
+    # process converts with the same settings as the parent.
+    global NOESIS_PATH, PVR_TEX_TOOL_PATH, embedimage, zerocopy, quantize, meshopt, meshoptfallback, optimizemeshes, vertexlayout, animationtolerance, texturejobs, texturecache, texturedecoder
+    if options.get("noesis_path"):
+        NOESIS_PATH = options["noesis_path"]
+    if options.get("pvrtextool_path"):
+        PVR_TEX_TOOL_PATH = options["pvrtextool_path"]
+    embedimage = options.get("embed_image", False)
+    zerocopy = options.get("mmap", False)
+    quantize = options.get("quantize", False)
+    optimizemeshes = options.get("optimize_meshes", False)
+    vertexlayout = options.get("vertex_layout") or "source"
+    animationtolerance = options.get("animation_tolerance", 1e-4)
+    meshopt = options.get("meshopt", False)
+    meshoptfallback = options.get("meshopt_fallback", True)
+    texturejobs = max(1, options.get("texture_jobs") or os.cpu_count())
+    texturedecoder = options.get("texture_decoder") or "auto"
+    if texturedecoder == "builtin" and not hasdecoder:
+        print("[WARNING] --texture-decoder builtin needs texture2ddecoder (pip install texture2ddecoder). Using PVRTexTool instead.")
+    if options.get("texture_cache"):
+        texturecache = TextureCache(options["texture_cache"], options.get("texture_cache_size", 1024) * 1024 * 1024)
+
+def find_companion_xml(pod_path):
+    # Check if a companion XML exists with the POD.
+    expected_xml_path = str(os.path.basename(pod_path)).replace(".pod", "_model.xml")
+    print(f"[DEBUG] Expected XML path for this POD: {expected_xml_path}")
+
+    found = None
+    for root, dirs, files in os.walk(os.path.dirname(pod_path)):
+        for file in files:
+            if file != expected_xml_path:
+                continue  # Skip if this file is not expected.
+            # File has been found:
+            print(f"[XML] XML file found: {str(file)}")
+            xmlpath = os.path.join(os.path.dirname(pod_path), file)
+            xmldata = etree.parse(xmlpath)
+            found = xmldata.getroot()
+            print(f"Model is called \"{found.attrib["Name"]}\"")
+    return found
+
+def convert_pod(pod_path, glb_path, fix_armature=False):
+    global pathto, pathout  # Used when converting textures.
+    pathto = pod_path
+    pathout = glb_path
+
+    global xmlroot  # Reset for every model in batch mode.
+    xmlroot = find_companion_xml(pathto)
+
+    converter = POD2GLB.open(pathto)
+    try:
+        converter.save(pathout)
+    finally:
+        converter.pod.close()
+
+    if fix_armature:
+        convert_to_fbx(pathout)
+    else:
+        print("[DEBUG] Will not convert to FBX as --fix-armature option was not specified.")
+
+def collect_batch_jobs(inputs, output_dir):
+    # Expands directories (recursively) and glob patterns into
+    # (pod path, glb path) pairs. Directory inputs keep their
+    # subdirectory layout under output_dir.
+    jobs = []
+    claimed = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            found = []
+            for root, dirs, files in os.walk(pattern):
+                for file in files:
+                    if file.lower().endswith(".pod"):
+                        pod_path = os.path.join(root, file)
+                        found.append((pod_path, os.path.relpath(pod_path, pattern)))
+        else:
+            found = [(pod_path, os.path.basename(pod_path)) for pod_path in glob.glob(pattern, recursive=True)
+                     if pod_path.lower().endswith(".pod")]
+
+        for (pod_path, relative) in sorted(found):
+            glb_path = os.path.join(output_dir, f"{os.path.splitext(relative)[0]}.glb")
+            if glb_path in claimed:
+                print(f"[BATCH - WARNING] Skipping {pod_path}, another input already writes {glb_path}.")
+                continue
+            claimed.add(glb_path)
+            jobs.append((pod_path, glb_path))
+    return jobs
+
+def batch_convert_single(pod_path, glb_path, options, fix_armature):
+    # Runs in a worker process. Any failure is reported back instead of
+    # raised so one broken model doesn't take down the whole batch.
+    apply_options(options)
+    os.makedirs(os.path.dirname(glb_path) or ".", exist_ok=True)
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            convert_pod(pod_path, glb_path, fix_armature)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return {
+        "pod_path": pod_path,
+        "glb_path": glb_path,
+        "error": error,
+        "log": log.getvalue(),
+        "seconds": time.perf_counter() - start
+    }
+
+def run_batch(inputs, output_dir, jobs_count, options, fix_armature, verbose=False):
+    jobs = collect_batch_jobs(inputs, output_dir)
+    if not jobs:
+        print("[BATCH - ERROR!] No .pod files matched the given inputs.")
+        return False
+    print(f"[BATCH] Converting {len(jobs)} POD(s) with {jobs_count} worker(s)...")
+
+    start = time.perf_counter()
+    failed = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=jobs_count) as executor:
+        futures = [executor.submit(batch_convert_single, pod_path, glb_path, options, fix_armature)
+                   for (pod_path, glb_path) in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            done += 1
+            status = "OK" if result["error"] is None else "FAILED"
+            print(f"[BATCH] ({done}/{len(jobs)}) {status} {result["pod_path"]} -> {result["glb_path"]} ({result["seconds"]:.2f}s)")
+            if result["error"] is not None:
+                failed.append(result)
+            elif verbose:
+                print(result["log"], end="")
+
+    print(f"[BATCH - FINISH!] {len(jobs) - len(failed)} converted, {len(failed)} failed in {time.perf_counter() - start:.2f}s.")
+    # The log shows how far each failed conversion got.
+    for result in failed:
+        print(f"[BATCH - ERROR!] {result["pod_path"]}:")
+        print(result["log"], end="")
+        print(result["error"])
+    return not failed
+
 def main():
     # Create argparse instance and add arguments.
     parser = argparse.ArgumentParser(description="Converts POD models from Miitomo to glTF (.glb) format.")
 
     # Add positional arguments.
-    parser.add_argument("pod_path", type=str, help="Path to the input POD file. The XML and textures are expected to be relative to this.")
-    parser.add_argument("glb_path", type=str, help="Path to the output glTF model/.glb file.")
+    parser.add_argument("pod_path", type=str, nargs="?", help="Path to the input POD file. The XML and textures are expected to be relative to this.")
+    parser.add_argument("glb_path", type=str, nargs="?", help="Path to the output glTF model/.glb file.")
+
+    # Batch mode: many PODs in one launch, spread over worker processes.
+    parser.add_argument("--batch", type=str, nargs="+", metavar="INPUT", help="Convert every .pod in these directories or glob patterns instead of a single file. Requires --output-dir.")
+    parser.add_argument("-o", "--output-dir", type=str, help="Directory the .glb files are written to in --batch mode.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes for --batch (default: CPU count).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="With --batch, print the conversion log of every model, not only of the ones that failed.")
 
     # Optional flag to fix armature/convert to FBX.
     parser.add_argument("-f", "--fix-armature", action="store_true", help="Tries to fix Blender quirks with GLB files by converting it to a FBX file using Noesis.")
 
     parser.add_argument("-e", "--embed-image", action="store_true", help="Embed images in the .glb itself, rather than alongside the model file. Needed to load the model in web browsers.")
 
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the POD and reference vertex, index and animation data in place instead of copying it. Lowers peak memory on large models.")
+
+    parser.add_argument("--quantize", action="store_true", help="Store vertex data with KHR_mesh_quantization (16-bit positions and UVs, 8-bit normals). Much smaller geometry, viewers must support the extension.")
+
+    parser.add_argument("--vertex-layout", choices=["source", "interleave"], default="source", help="source: one bufferView per vertex buffer of the POD (one for interleaved PODs, one per attribute otherwise). interleave: copy all attributes of a mesh into a single interleaved buffer.")
+
+    parser.add_argument("--animation-tolerance", type=float, default=1e-4, metavar="ERROR", help="Drop animation keyframes that interpolating their neighbours reproduces within this error, and constant tracks (default: 0.0001). Negative keeps every frame.")
+
+    parser.add_argument("--optimize-meshes", action="store_true", help="Reorder triangles for the GPU's post-transform vertex cache and vertices for fetch locality. Prints the ACMR (vertices transformed per triangle) before and after.")
+
+    parser.add_argument("--meshopt", action="store_true", help="Compress vertex and index data with EXT_meshopt_compression. Works best together with --quantize.")
+    parser.add_argument("--meshopt-no-fallback", action="store_true", help="With --meshopt, leave out the uncompressed copy of the data. Smaller, but viewers without EXT_meshopt_compression can't load the model.")
+
+    parser.add_argument("--texture-jobs", type=int, default=os.cpu_count(), help="Number of textures converted at the same time (default: CPU count).")
+
+    parser.add_argument("--texture-decoder", choices=["auto", "builtin", "external"], default="auto", help="auto/builtin: decode supported textures (PVRTC, ETC1) inside this process with texture2ddecoder and use PVRTexTool only for other formats. external: always run PVRTexTool.")
+    parser.add_argument("--texture-cache", type=str, metavar="DIR", help="Reuse converted textures across runs. Identical .pvr files are only converted once and then linked/copied from DIR.")
+    parser.add_argument("--texture-cache-size", type=int, default=1024, metavar="MB", help="Size limit of --texture-cache. Least recently used textures are evicted past it at the end of each run (default: 1024).")
+
     # Optional arguments to specify Noesis/PVRTexTool paths.
     parser.add_argument("--noesis-path", type=str, help="Path to Noesis binary.")
     parser.add_argument("--pvrtextool-path", type=str, help="Path to PVRTexTool.")
     args = parser.parse_args()
 
-    global pathto, pathout  # Used when converting textures.
-    pathto = args.pod_path
-    pathout = args.glb_path
-
-    # Set Noesis and PVRTexTool paths.
-    global NOESIS_PATH, PVR_TEX_TOOL_PATH
-    if args.noesis_path:
-        NOESIS_PATH = args.noesis_path
-    if args.pvrtextool_path:
-        PVR_TEX_TOOL_PATH = args.pvrtextool_path
-
-    global embedimage
-    if args.embed_image is not None:
-        print("[DEBUG] Embedding all images in the output .glb.")
-        embedimage = args.embed_image
+    if args.batch is None and (args.pod_path is None or args.glb_path is None):
+        parser.error("pod_path and glb_path are required unless --batch is used.")
+    if args.batch is not None and args.output_dir is None:
+        parser.error("--batch requires --output-dir.")
 
-    # Check if a companion XML exists with the POD.
-    expected_xml_path = str(os.path.basename(pathto)).replace(".pod", "_model.xml")
-    print(f"[DEBUG] Expected XML path for this POD: {expected_xml_path}")
-
-    global xmlroot  # Global that's initialized to None.
-    for root, dirs, files in os.walk(os.path.dirname(pathto)):
-        for file in files:
-            if file != expected_xml_path:
-                continue  # Skip if this file is not expected.
-            # File has been found:
-            print(f"[XML] XML file found: {str(file)}")
-            xmlpath = os.path.join(os.path.dirname(pathto), file)
-            xmldata = etree.parse(xmlpath)
-            xmlroot = xmldata.getroot()  # Global
-            print(f"Model is called \"{xmlroot.attrib["Name"]}\"")
+    print_banner()
 
-    converter = POD2GLB.open(pathto)
-    converter.save(pathout)
-
-    if args.fix_armature:
-        convert_to_fbx(pathout)
-    else:
-        print("[DEBUG] Will not convert to FBX as --fix-armature option was not specified.")
+    if args.embed_image:
+        print("[DEBUG] Embedding all images in the output .glb.")
+    options = {
+        "noesis_path": args.noesis_path,
+        "pvrtextool_path": args.pvrtextool_path,
+        "embed_image": args.embed_image,
+        "mmap": args.mmap,
+        "quantize": args.quantize,
+        "optimize_meshes": args.optimize_meshes,
+        "vertex_layout": args.vertex_layout,
+        "animation_tolerance": args.animation_tolerance,
+        "meshopt": args.meshopt,
+        "meshopt_fallback": not args.meshopt_no_fallback,
+        "texture_jobs": args.texture_jobs,
+        "texture_decoder": args.texture_decoder,
+        "texture_cache": args.texture_cache,
+        "texture_cache_size": args.texture_cache_size
+    }
+    apply_options(options)
+
+    try:
+        if args.batch is not None:
+            if not run_batch(args.batch, args.output_dir, max(1, args.jobs), options, args.fix_armature, args.verbose):
+                sys.exit(1)
+            return
+
+        convert_pod(args.pod_path, args.glb_path, args.fix_armature)
+    finally:
+        # Once per run: in --batch mode every worker shares the cache.
+        if texturecache is not None:
+            texturecache.evict()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,118 @@
+import os
+import sys
+
+# the repository root holds the GLB and PowerVR packages and pod2glb.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import struct
+
+import pytest
+
+# Minimal POD writer for the tests: a scene of meshes with interleaved
+# position/normal/uv (and optionally bone) data, one node per mesh under a
+# shared root, a texture and a material.
+
+endTagMask = 0x80000000
+
+
+def tag(ident, payload=b""):
+    return struct.pack("<II", ident, len(payload)) + payload + struct.pack("<II", ident | endTagMask, 0)
+
+
+def i32(value):
+    return struct.pack("<i", value)
+
+
+def u32(value):
+    return struct.pack("<I", value)
+
+
+def f32s(*values):
+    return struct.pack(f"<{len(values)}f", *values)
+
+
+def vertex_element(ident, data_type, num_components, stride, offset):
+    return tag(ident, tag(9000, u32(data_type)) + tag(9001, i32(num_components)) + tag(9002, i32(stride)) + tag(9003, u32(offset)))
+
+
+def mesh_block(num_vertices, skinned=False, strips=False, index32=False):
+    stride = 52 if skinned else 32
+    data = bytearray()
+    for v in range(num_vertices):
+        angle = v * 0.1
+        data += f32s(math.cos(angle) * v, math.sin(angle), v * 0.01)
+        data += f32s(0, 0, 1)
+        data += f32s(v / num_vertices, 1 - v / num_vertices)
+        if skinned:
+            data += bytes((v % 2, (v + 1) % 2, 0, 0))
+            data += f32s(0.75, 0.25, 0, 0)
+    if strips:
+        indices = list(range(num_vertices))
+    else:
+        indices = [i for v in range(num_vertices - 2) for i in (v, v + 1, v + 2)]
+    body = tag(6000, u32(num_vertices))
+    body += tag(6001, u32(num_vertices - 2))
+    body += tag(6002, i32(1))
+    if strips:
+        body += tag(6004, u32(num_vertices - 2))
+        body += tag(6005, u32(1))
+    index_format = "I" if index32 else "H"
+    body += tag(6003, tag(9000, u32(17 if index32 else 3)) + tag(9003, struct.pack(f"<{len(indices)}{index_format}", *indices)))
+    body += tag(6014, bytes(data))
+    body += vertex_element(6006, 1, 3, stride, 0)
+    body += vertex_element(6007, 1, 3, stride, 12)
+    body += vertex_element(6010, 1, 2, stride, 24)
+    if skinned:
+        # one batch of bones 1 and 2
+        body += vertex_element(6012, 10, 4, stride, 32)
+        body += vertex_element(6013, 1, 4, stride, 36)
+        body += tag(6015, struct.pack("<2I", 1, 2))
+        body += tag(6016, u32(2))
+        body += tag(6017, u32(0))
+        body += tag(6018, u32(2))
+        body += tag(6019, u32(1))
+    return tag(2012, body)
+
+
+def node_block(name, index, parent, material=-1, num_frames=1, matrix=False):
+    body = tag(5000, i32(index)) + tag(5001, name.encode() + b"\0") + tag(5002, i32(material)) + tag(5003, i32(parent))
+    flags = 1 if num_frames > 1 else 0
+    if matrix:
+        matrices = []
+        for frame in range(num_frames):
+            (c, s) = (math.cos(frame * 0.1), math.sin(frame * 0.1))
+            matrices += [c, s, 0, 0, -s, c, 0, 0, 0, 0, 1, 0, frame * 0.5, 1, 2, 1]
+        body += tag(5011, f32s(*matrices))
+        flags |= 8
+    body += tag(5007, f32s(*[value for frame in range(num_frames) for value in (frame * 1.0, 2.0, 3.0)]))
+    body += tag(5008, f32s(*([0, 0, 0, 1] * num_frames)))
+    body += tag(5009, f32s(*([1, 1, 1, 0, 0, 0, 0] * num_frames)))
+    body += tag(5012, u32(flags))
+    body += tag(5017, b"ud")
+    return tag(2013, body)
+
+
+def write_pod(path, num_meshes=2, num_frames=1, matrix=False, root_parent=-1, mesh_node_count=True, **mesh_options):
+    scene = tag(2000, f32s(0, 0, 0)) + tag(2001, f32s(0, 0, 0))
+    scene += tag(2004, i32(num_meshes)) + tag(2005, i32(num_meshes + 1))
+    if mesh_node_count:
+        scene += tag(2006, i32(num_meshes))
+    scene += tag(2007, i32(1)) + tag(2008, i32(1)) + tag(2009, i32(num_frames)) + tag(2017, i32(30))
+    for m in range(num_meshes):
+        scene += mesh_block(40 + m * 10, **mesh_options)
+    for m in range(num_meshes):
+        scene += node_block(f"mesh{m}", m, num_meshes, 0, num_frames, matrix)
+    scene += node_block("root", -1, root_parent, -1, num_frames, matrix)
+    scene += tag(2014, tag(4000, b"tex0.pvr\0"))
+    scene += tag(2015, tag(3000, b"mat0\0") + tag(3001, i32(0)) + tag(3004, f32s(1, 0.5, 0.25)) + tag(3002, f32s(1.0)))
+    scene += tag(2018, b"sceneuserdata")
+    with open(path, "wb") as f:
+        f.write(tag(1000, b"AB.POD.2.0\0") + tag(1001, scene))
+    return str(path)
+
+
+@pytest.fixture
+def make_pod(tmp_path):
+    # make_pod(name, **options) writes a synthetic POD and returns its path
+    return lambda name, **options: write_pod(tmp_path / name, **options)
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from GLB import GLBAnimation
+
+
+def random_rotations(rng, count):
+    quaternions = rng.normal(size=(count, 4))
+    return quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+
+def column_major(matrices):
+    # (n, 4, 4) (row, column) -> (n, 16) as POD and glTF store them
+    return matrices.transpose(0, 2, 1).reshape(-1, 16)
+
+
+def same_rotations(a, b):
+    # q and -q are the same rotation
+    return np.minimum(np.abs(a - b).max(axis=1), np.abs(a + b).max(axis=1))
+
+
+def test_decompose_recompose_round_trip():
+    rng = np.random.default_rng(0)
+    count = 500
+    translations = rng.uniform(-100, 100, size=(count, 3))
+    rotations = random_rotations(rng, count)
+    scales = rng.uniform(0.01, 10, size=(count, 3))
+    matrices = GLBAnimation.composeMatrices(translations, rotations, scales)
+
+    (t, r, s) = GLBAnimation.decomposeMatrices(column_major(matrices))
+    assert np.allclose(t, translations)
+    assert np.allclose(s, scales)
+    assert same_rotations(r, rotations).max() < 1e-9
+    assert np.allclose(np.linalg.norm(r, axis=1), 1)
+    assert np.allclose(GLBAnimation.composeMatrices(t, r, s), matrices)
+
+
+def test_decompose_mirrored_and_degenerate_matrices():
+    rng = np.random.default_rng(1)
+    rotations = random_rotations(rng, 50)
+    scales = rng.uniform(0.5, 2, size=(50, 3)) * rng.choice([-1, 1], size=(50, 3))
+    matrices = GLBAnimation.composeMatrices(rng.normal(size=(50, 3)), rotations, scales)
+    (t, r, s) = GLBAnimation.decomposeMatrices(column_major(matrices))
+    # mirroring ends up in the x scale, and the matrix is still reproduced
+    assert np.array_equal(s[:, 0] < 0, np.prod(np.sign(scales), axis=1) < 0)
+    assert (s[:, 1:] > 0).all()
+    assert np.allclose(GLBAnimation.composeMatrices(t, r, s), matrices)
+
+    # a zero scale must not produce NaNs
+    flat = GLBAnimation.composeMatrices(np.zeros((1, 3)), [[0, 0, 0, 1]], [[1, 0, 1]])
+    (t, r, s) = GLBAnimation.decomposeMatrices(column_major(flat))
+    assert np.isfinite(r).all() and np.allclose(s, [[1, 0, 1]])
+
+
+def test_align_quaternions_per_track():
+    rng = np.random.default_rng(2)
+    quaternions = random_rotations(rng, 40)
+    quaternions[1::2] *= -1
+    aligned = GLBAnimation.alignQuaternions(quaternions, starts=(0, 25))
+    # same rotations, no sign flip between neighbours, track starts untouched
+    assert same_rotations(aligned, quaternions).max() == 0
+    dots = (aligned[1:] * aligned[:-1]).sum(axis=1)
+    assert (np.delete(dots, 24) >= 0).all()
+    assert np.array_equal(aligned[[0, 25]], quaternions[[0, 25]])
+
+
+def test_gather_frames():
+    data = np.arange(24, dtype=np.float32).tobytes()
+    assert GLBAnimation.gatherFrames(data, None, 3, 4).tolist() == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11]]
+    # more frames than data, or none at all, clamp to what is there
+    assert len(GLBAnimation.gatherFrames(data, None, 3, 100)) == 8
+    assert GLBAnimation.gatherFrames(data, None, 3, 0).tolist() == [[0, 1, 2]]
+    # index lists hold the float offset of every frame
+    indices = np.array([6, 6, 0], dtype=np.uint32).tobytes()
+    assert GLBAnimation.gatherFrames(data, indices, 3, 3).tolist() == [[6, 7, 8], [6, 7, 8], [0, 1, 2]]
+    assert GLBAnimation.gatherFrames(data, indices, 3, 0).tolist() == [[6, 7, 8]]
+
+
+def reconstruct(values, kept, start, end, spherical):
+    # every frame of values[start:end] interpolated from its kept keys
+    keys = start + np.flatnonzero(kept[start:end])
+    frames = np.arange(start, end)
+    following = keys[np.minimum(np.searchsorted(keys, frames), len(keys) - 1)]
+    previous = keys[np.maximum(np.searchsorted(keys, frames, side="right") - 1, 0)]
+    span = np.where(following > previous, following - previous, 1)
+    t = (frames - previous) / span
+    if spherical:
+        return GLBAnimation.slerp(values[previous], values[following], t)
+    return values[previous] + (values[following] - values[previous]) * t[:, None]
+
+
+@pytest.mark.parametrize("spherical", [False, True])
+def test_reduce_keyframes_stays_within_tolerance(spherical):
+    rng = np.random.default_rng(3)
+    tolerance = 1e-3
+    lengths = [1, 2, 30, 200, 57]
+    # smooth curves with a few jumps
+    frames = np.arange(sum(lengths))[:, None]
+    values = np.sin(frames * rng.uniform(0.002, 0.01, size=4 if spherical else 3) + rng.uniform(0, 3, size=4 if spherical else 3))
+    values[rng.integers(0, len(values), 10)] += 0.5
+    if spherical:
+        values /= np.linalg.norm(values, axis=1, keepdims=True)
+    starts = np.cumsum(lengths) - lengths
+
+    kept = GLBAnimation.reduceKeyframes(values, starts, tolerance, spherical)
+    assert kept.sum() < len(values) // 2
+    for (start, length) in zip(starts, lengths):
+        end = start + length
+        assert kept[start] and kept[end - 1]
+        interpolated = reconstruct(values, kept, start, end, spherical)
+        actual = values[start:end]
+        if spherical:
+            errors = np.minimum(np.abs(interpolated - actual).max(axis=1), np.abs(interpolated + actual).max(axis=1))
+        else:
+            errors = np.abs(interpolated - actual).max(axis=1)
+        assert errors.max() <= tolerance + 1e-12
+
+
+def test_reduce_keyframes_linear_and_constant_tracks():
+    ramp = np.linspace(0, 1, 50)[:, None] * [1, 2, 3]
+    still = np.tile([4.0, 5.0, 6.0], (20, 1))
+    values = np.concatenate((ramp, still))
+    starts = [0, 50]
+    kept = GLBAnimation.reduceKeyframes(values, starts, 1e-6)
+    assert np.flatnonzero(kept).tolist() == [0, 49, 50, 69]
+    assert GLBAnimation.constantTracks(values, starts, 1e-6).tolist() == [False, True]
+    # a negative tolerance is never met, so nothing is dropped
+    assert GLBAnimation.reduceKeyframes(values, starts, -1).all()
@@ -0,0 +1,41 @@
+import struct
+
+import pytest
+
+from GLB.GLBExporter import GLBExporter
+
+
+def read_bin_chunk(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    (length,) = struct.unpack_from("<I", data, 12)
+    (binLength,) = struct.unpack_from("<I", data, 20 + length)
+    return data[28 + length:28 + length + binLength]
+
+
+def test_data_and_files_are_laid_out_in_order(tmp_path):
+    image = tmp_path / "image.png"
+    image.write_bytes(b"abcdefg")
+    glb = GLBExporter()
+    first = glb.addData(b"xyz")
+    # files are only read by save()
+    fileOffset = glb.addFile(str(image))
+    image.write_bytes(b"ABCDEFG")
+    second = glb.addData(b"xyz")
+    last = glb.addData(bytearray(b"12345678"))
+    assert (first, fileOffset, second, last) == (0, 4, 0, 12)
+
+    glb.save(str(tmp_path / "out.glb"))
+    binary = read_bin_chunk(tmp_path / "out.glb")
+    assert binary == b"xyz\0ABCDEFG\0" + b"12345678"
+    assert glb.dedupedBytes == 3
+
+
+def test_file_changing_size_before_save_raises(tmp_path):
+    image = tmp_path / "image.png"
+    image.write_bytes(b"abcd")
+    glb = GLBExporter()
+    glb.addFile(str(image))
+    image.write_bytes(b"abcdef")
+    with pytest.raises(IOError):
+        glb.save(str(tmp_path / "out.glb"))
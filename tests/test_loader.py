@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from PowerVR.PVRPODIndex import PVRPODIndex
+from PowerVR.PVRPODLoader import PVRPODLoader
+
+
+def payload(value):
+    # bytes, array and memoryview payloads compare by content
+    return None if value is None else bytes(value)
+
+
+def mesh_snapshot(mesh):
+    return {
+        "primitiveData": mesh.primitiveData,
+        "vertexElements": mesh.vertexElements,
+        "vertexElementData": [payload(data) for data in mesh.vertexElementData],
+        "indexType": mesh.faces["indexType"],
+        "faces": payload(mesh.faces["data"]),
+        "boneBatches": {name: payload(value) if name == "batches" else value for (name, value) in mesh.boneBatches.items()},
+    }
+
+
+def node_snapshot(node):
+    animation = node.animation
+    tracks = ("positions", "rotations", "scales", "matrices", "positionIndices", "rotationIndices", "scaleIndices", "matrixIndices")
+    return {
+        "name": node.name,
+        "index": node.index,
+        "parentIndex": node.parentIndex,
+        "materialIndex": node.materialIndex,
+        "userData": payload(node.userData),
+        "flags": animation.flags,
+        "tracks": {name: payload(getattr(animation, name)) for name in tracks},
+    }
+
+
+def material_snapshot(material):
+    return {"name": material.name, "diffuseTextureIndex": material.diffuseTextureIndex, "diffuse": list(material.diffuse)}
+
+
+def scene_snapshot(scene):
+    return {
+        "numFrames": scene.numFrames,
+        "numMeshNodes": scene.numMeshNodes,
+        "userData": payload(scene.userData),
+        "meshes": [mesh_snapshot(mesh) for mesh in scene.meshes],
+        "nodes": [node_snapshot(node) for node in scene.nodes],
+        "materials": [material_snapshot(material) for material in scene.materials],
+        "textures": [texture.name for texture in scene.textures],
+    }
+
+
+@pytest.fixture(params=[{}, {"skinned": True, "index32": True, "num_frames": 5, "matrix": True}, {"strips": True}], ids=["plain", "skinned", "strips"])
+def pod_path(request, make_pod):
+    return make_pod("model.pod", **request.param)
+
+
+@pytest.mark.parametrize("zeroCopy, lazy", [(True, False), (False, True), (True, True)])
+def test_loader_modes_match(pod_path, zeroCopy, lazy):
+    with PVRPODLoader.open(pod_path) as loader:
+        expected = scene_snapshot(loader.scene)
+    assert len(expected["meshes"]) == 2 and len(expected["nodes"]) == 3
+    with PVRPODLoader.open(pod_path, zeroCopy, lazy) as loader:
+        assert loader.scene.meshes[0].IsDeferred("faces") == lazy
+        assert scene_snapshot(loader.scene) == expected
+
+
+def test_zero_copy_views_outlive_close(pod_path):
+    with PVRPODLoader.open(pod_path) as loader:
+        expected = payload(loader.scene.meshes[0].vertexElementData[0])
+    loader = PVRPODLoader.open(pod_path, zeroCopy=True)
+    data = loader.scene.meshes[0].vertexElementData[0]
+    assert isinstance(data, memoryview)
+    loader.close()
+    assert bytes(data) == expected
+
+
+@pytest.mark.parametrize("zeroCopy, lazy", [(False, False), (True, False), (False, True), (True, True)])
+def test_indexed_blocks_match(pod_path, zeroCopy, lazy):
+    with PVRPODLoader.open(pod_path) as loader:
+        expected = scene_snapshot(loader.scene)
+
+    # the first open walks the file and saves the index next to it
+    with PVRPODLoader.openIndexed(pod_path, zeroCopy, lazy) as loader:
+        assert loader.scene is not None
+        assert scene_snapshot(loader.scene) == expected
+    assert os.path.exists(PVRPODIndex.PathFor(pod_path))
+
+    with PVRPODLoader.openIndexed(pod_path, zeroCopy, lazy) as loader:
+        assert loader.scene is None
+        blocks = loader.index.blocks
+        assert [entry["name"] for entry in blocks["nodes"]] == [node["name"] for node in expected["nodes"]]
+        assert [mesh_snapshot(loader.ReadMesh(i)) for i in range(len(blocks["meshes"]))] == expected["meshes"]
+        assert [node_snapshot(loader.ReadNode(i)) for i in range(len(blocks["nodes"]))] == expected["nodes"]
+        assert [material_snapshot(loader.ReadMaterial(i)) for i in range(len(blocks["materials"]))] == expected["materials"]
+        assert [loader.ReadTexture(i).name for i in range(len(blocks["textures"]))] == expected["textures"]
+
+
+def test_index_save_failure_is_ignored(make_pod, monkeypatch):
+    pod_path = make_pod("model.pod")
+
+    def save(index, path=None):
+        raise PermissionError("read-only directory")
+
+    monkeypatch.setattr(PVRPODIndex, "Save", save)
+    with PVRPODLoader.openIndexed(pod_path) as loader:
+        assert len(loader.scene.meshes) == 2
+        assert len(loader.index.blocks["meshes"]) == 2
+        assert loader.ReadMesh(1).primitiveData["numVertices"] == 50
+    assert not os.path.exists(PVRPODIndex.PathFor(pod_path))
+
+
+def test_stale_index_is_rebuilt(make_pod):
+    pod_path = make_pod("model.pod")
+    PVRPODLoader.openIndexed(pod_path).close()
+    assert PVRPODIndex.load(pod_path) is not None
+
+    make_pod("model.pod", num_meshes=3)
+    assert PVRPODIndex.load(pod_path) is None
+    with PVRPODLoader.openIndexed(pod_path, save=False) as loader:
+        assert len(loader.scene.meshes) == 3
+        assert len(loader.index.blocks["meshes"]) == 3
+    assert PVRPODIndex.load(pod_path) is None
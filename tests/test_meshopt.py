@@ -0,0 +1,210 @@
+# Round trips through the meshopt codecs, decoded with a transcription of
+# the EXT_meshopt_compression reference decoders.
+
+import numpy as np
+import pytest
+
+from GLB import GLBMeshopt
+
+
+def decode_vertex_buffer(buf, count, stride):
+    assert buf[0] == 0xa0
+    position = 1
+    last = bytearray(buf[len(buf) - stride:])
+    block_size = min((8192 // stride) & ~15, 256)
+    out = bytearray(count * stride)
+    start = 0
+    while start < count:
+        size = min(block_size, count - start)
+        groups = ((size + 15) & ~15) // 16
+        for k in range(stride):
+            header = buf[position:position + (groups + 3) // 4]
+            position += len(header)
+            deltas = []
+            for group in range(groups):
+                bits = (0, 2, 4, 8)[(header[group // 4] >> (group % 4 * 2)) & 3]
+                if bits == 0:
+                    deltas += [0] * 16
+                elif bits == 8:
+                    deltas += buf[position:position + 16]
+                    position += 16
+                else:
+                    per_byte = 8 // bits
+                    packed = buf[position:position + 16 // per_byte]
+                    position += len(packed)
+                    sentinel = (1 << bits) - 1
+                    values = [(byte >> (8 - bits * (shift + 1))) & sentinel for byte in packed for shift in range(per_byte)]
+                    for i in range(16):
+                        if values[i] == sentinel:
+                            values[i] = buf[position]
+                            position += 1
+                    deltas += values
+            value = last[k]
+            for i in range(size):
+                z = deltas[i]
+                value = (value + ((z >> 1) ^ (-(z & 1) & 0xff))) & 0xff
+                out[(start + i) * stride + k] = value
+        last = out[(start + size - 1) * stride:(start + size) * stride]
+        start += size
+    assert len(buf) - position == max(32, stride)
+    return bytes(out)
+
+
+def decode_index_buffer(buf, count):
+    assert buf[0] == 0xe1
+    table = buf[len(buf) - 16:]
+    code = 1
+    data = 1 + count // 3
+    edges = [(-1, -1)] * 16
+    vertices = [-1] * 16
+    edge_offset = 0
+    vertex_offset = 0
+    next_index = 0
+    last = 0
+    out = []
+
+    def decode_index():
+        nonlocal data, last
+        value = 0
+        shift = 0
+        while True:
+            byte = buf[data]
+            data += 1
+            value |= (byte & 127) << shift
+            shift += 7
+            if byte < 128:
+                break
+        last = (last + ((value >> 1) ^ (-(value & 1) & 0xffffffff))) & 0xffffffff
+        return last
+
+    def push_vertex(v, advance=True):
+        nonlocal vertex_offset
+        vertices[vertex_offset] = v
+        vertex_offset = (vertex_offset + advance) & 15
+
+    def push_edge(a, b):
+        nonlocal edge_offset
+        edges[edge_offset] = (a, b)
+        edge_offset = (edge_offset + 1) & 15
+
+    for _ in range(count // 3):
+        codetri = buf[code]
+        code += 1
+        if codetri < 0xf0:
+            (a, b) = edges[(edge_offset - 1 - (codetri >> 4)) & 15]
+            fec = codetri & 15
+            if fec == 0:
+                c = next_index
+                next_index += 1
+            elif fec < 13:
+                c = vertices[(vertex_offset - 1 - fec) & 15]
+            elif fec < 15:
+                c = last = (last + (-1 if fec == 13 else 1)) & 0xffffffff
+            else:
+                c = decode_index()
+            push_vertex(c, fec == 0 or fec >= 13)
+            out += [a, b, c]
+            push_edge(c, b)
+            push_edge(a, c)
+            continue
+        if codetri < 0xfe:
+            codeaux = table[codetri & 15]
+            a = next_index
+            next_index += 1
+        else:
+            codeaux = buf[data]
+            data += 1
+            if codeaux == 0:
+                next_index = 0
+            if codetri == 0xfe:
+                a = next_index
+                next_index += 1
+            else:
+                a = decode_index()
+        (feb, fec) = (codeaux >> 4, codeaux & 15)
+        if feb == 0:
+            b = next_index
+            next_index += 1
+        elif feb == 15 and codetri >= 0xfe:
+            b = decode_index()
+        else:
+            b = vertices[(vertex_offset - feb) & 15]
+        if fec == 0:
+            c = next_index
+            next_index += 1
+        elif fec == 15 and codetri >= 0xfe:
+            c = decode_index()
+        else:
+            c = vertices[(vertex_offset - fec) & 15]
+        explicit = (0, 15) if codetri >= 0xfe else (0,)
+        push_vertex(a)
+        push_vertex(b, feb in explicit)
+        push_vertex(c, fec in explicit)
+        out += [a, b, c]
+        push_edge(b, a)
+        push_edge(c, b)
+        push_edge(a, c)
+    assert data == len(buf) - 16
+    return out
+
+
+def canonical_triangles(indices):
+    # the index codec may rotate a triangle, which keeps its winding
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    rotations = np.stack([np.roll(triangles, -shift, axis=1) for shift in range(3)], axis=1)
+    return rotations[np.arange(len(triangles)), triangles.argmin(axis=1)]
+
+
+@pytest.mark.parametrize("count, stride", [(1, 4), (15, 8), (17, 12), (300, 32), (700, 12), (1000, 256)])
+def test_vertex_codec_round_trip(count, stride):
+    rng = np.random.default_rng(count * stride)
+    # smooth streams for the narrow bit widths, noise for the 8-bit groups
+    smooth = np.cumsum(rng.integers(-3, 4, size=(count, stride)), axis=0)
+    noise = rng.integers(0, 256, size=(count, stride))
+    vertices = np.where(np.arange(stride) % 3 == 0, noise, smooth).astype(np.uint8)
+    data = vertices.tobytes()
+    encoded = GLBMeshopt.encodeVertexBuffer(data, count, stride)
+    assert decode_vertex_buffer(encoded, count, stride) == data
+
+
+def test_vertex_codec_constant_data():
+    data = bytes(64 * 16)
+    encoded = GLBMeshopt.encodeVertexBuffer(data, 64, 16)
+    assert decode_vertex_buffer(encoded, 64, 16) == data
+    assert len(encoded) < len(data) // 4
+
+
+def test_vertex_codec_rejects_bad_stride():
+    with pytest.raises(ValueError):
+        GLBMeshopt.encodeVertexBuffer(bytes(30), 5, 6)
+
+
+def grid_triangles(width, height):
+    rows = np.arange(height - 1)[:, None] * width
+    corners = (rows + np.arange(width - 1)).ravel()
+    return np.stack((corners, corners + width, corners + 1, corners + 1, corners + width, corners + width + 1), axis=1).ravel()
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_index_codec_round_trip(shuffle):
+    indices = grid_triangles(20, 15)
+    if shuffle:
+        rng = np.random.default_rng(1)
+        indices = indices.reshape(-1, 3)[rng.permutation(len(indices) // 3)].ravel()
+        indices = rng.permutation(300)[indices]
+    encoded = GLBMeshopt.encodeIndexBuffer(indices)
+    decoded = decode_index_buffer(encoded, len(indices))
+    assert np.array_equal(canonical_triangles(decoded), canonical_triangles(indices))
+
+
+def test_index_codec_large_and_repeated_indices():
+    # large deltas, degenerate triangles and a vertex shared by every triangle
+    indices = [0, 70000, 1, 1, 70000, 5000000, 5000000, 2, 2, 0, 0, 0, 3, 70001, 70002]
+    encoded = GLBMeshopt.encodeIndexBuffer(indices)
+    decoded = decode_index_buffer(encoded, len(indices))
+    assert np.array_equal(canonical_triangles(decoded), canonical_triangles(indices))
+
+
+def test_index_codec_rejects_partial_triangles():
+    with pytest.raises(ValueError):
+        GLBMeshopt.encodeIndexBuffer([0, 1, 2, 3])
@@ -0,0 +1,53 @@
+import numpy as np
+
+from GLB import GLBOptimize
+
+
+def grid_triangles(width, height):
+    rows = np.arange(height - 1)[:, None] * width
+    corners = (rows + np.arange(width - 1)).ravel()
+    return np.stack((corners, corners + width, corners + 1, corners + 1, corners + width, corners + width + 1), axis=1).ravel()
+
+
+def sorted_triangles(indices):
+    triangles = indices.reshape(-1, 3)
+    return triangles[np.lexsort(triangles.T[::-1])]
+
+
+def shuffled_grid(seed):
+    rng = np.random.default_rng(seed)
+    indices = grid_triangles(40, 40)
+    return indices.reshape(-1, 3)[rng.permutation(len(indices) // 3)].ravel().astype(np.uint32)
+
+
+def test_vertex_cache_keeps_every_triangle():
+    indices = shuffled_grid(0)
+    optimized = GLBOptimize.optimizeVertexCache(indices, 1600)
+    assert optimized.dtype == indices.dtype
+    # triangles are reordered, never rotated or changed
+    assert np.array_equal(sorted_triangles(optimized), sorted_triangles(indices))
+
+
+def test_vertex_cache_lowers_acmr():
+    indices = shuffled_grid(1)
+    (before, _) = GLBOptimize.simulateCache(indices)
+    (after, _) = GLBOptimize.simulateCache(GLBOptimize.optimizeVertexCache(indices, 1600))
+    assert after < 0.75 * before
+    assert after < 1.0
+
+
+def test_vertex_cache_unused_vertices_and_empty_input():
+    indices = np.array([5, 6, 7, 7, 6, 8], dtype=np.uint16)
+    optimized = GLBOptimize.optimizeVertexCache(indices, 20)
+    assert np.array_equal(sorted_triangles(optimized), sorted_triangles(indices))
+    assert len(GLBOptimize.optimizeVertexCache(np.zeros(0, dtype=np.uint16), 4)) == 0
+
+
+def test_vertex_fetch_renumbers_in_order_of_first_use():
+    indices = np.array([4, 2, 0, 0, 2, 3], dtype=np.uint16)
+    (remapped, newToOld) = GLBOptimize.optimizeVertexFetch(indices, 6)
+    assert remapped.dtype == indices.dtype
+    assert remapped.tolist() == [0, 1, 2, 2, 1, 3]
+    assert newToOld.tolist() == [4, 2, 0, 3, 1, 5]
+    # the remapped mesh references the same vertices
+    assert np.array_equal(newToOld[remapped], indices)
@@ -0,0 +1,141 @@
+import json
+import os
+import struct
+
+import numpy as np
+import pytest
+
+import pod2glb
+from GLB import GLBAnimation
+from GLB.GLBExporter import GLBExporter
+from PowerVR.PVRPODLoader import PVRPODLoader
+
+componentDtypes = {5120: "i1", 5121: "u1", 5122: "<i2", 5123: "<u2", 5125: "<u4", 5126: "<f4"}
+typeSizes = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+
+def convert(pod_path, glb_path, **options):
+    # geometry, nodes, skins and animation only: textures need PVRTexTool
+    pod2glb.apply_options(options)
+    converter = pod2glb.POD2GLB()
+    converter.glb = GLBExporter()
+    with PVRPODLoader.open(pod_path) as converter.pod:
+        converter.scene = converter.pod.scene
+        converter.convert_meshes()
+        converter.convert_nodes()
+        converter.glb.save(glb_path)
+    with open(glb_path, "rb") as f:
+        data = f.read()
+    (length,) = struct.unpack_from("<I", data, 12)
+    gltf = json.loads(data[20:20 + length])
+    (binLength,) = struct.unpack_from("<I", data, 20 + length)
+    return (gltf, data[28 + length:28 + length + binLength])
+
+
+def read_accessor(gltf, binary, accessorIndex):
+    accessor = gltf["accessors"][accessorIndex]
+    bufferView = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = np.dtype(componentDtypes[accessor["componentType"]])
+    width = typeSizes[accessor["type"]]
+    stride = bufferView.get("byteStride", dtype.itemsize * width)
+    start = bufferView.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    rows = [np.frombuffer(binary, dtype=dtype, count=width, offset=start + i * stride) for i in range(accessor["count"])]
+    return np.array(rows).reshape(accessor["count"], width)
+
+
+def world_matrices(gltf):
+    nodes = gltf["nodes"]
+    local = []
+    for node in nodes:
+        if "matrix" in node:
+            local.append(np.array(node["matrix"]).reshape(4, 4).T)
+        else:
+            local.append(GLBAnimation.composeMatrices([node.get("translation", [0, 0, 0])], [node.get("rotation", [0, 0, 0, 1])], [node.get("scale", [1, 1, 1])])[0])
+    world = [None] * len(nodes)
+
+    def visit(nodeIndex, parent):
+        world[nodeIndex] = parent @ local[nodeIndex]
+        for child in nodes[nodeIndex].get("children", []):
+            visit(child, world[nodeIndex])
+
+    for root in gltf["scenes"][0]["nodes"]:
+        visit(root, np.eye(4))
+    return world
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_skin_inverse_bind_matrices(make_pod, tmp_path, quantize):
+    pod_path = make_pod("skinned.pod", skinned=True, index32=True, num_frames=5, matrix=True)
+    (gltf, binary) = convert(pod_path, str(tmp_path / "skinned.glb"), quantize=quantize)
+    world = world_matrices(gltf)
+
+    skinned = [(nodeIndex, node) for (nodeIndex, node) in enumerate(gltf["nodes"]) if "skin" in node]
+    assert len(skinned) == 2
+    for (nodeIndex, node) in skinned:
+        # skinned meshes ignore their node's transform, so it can't be split off
+        assert "mesh" in node
+        attributes = gltf["meshes"][node["mesh"]]["primitives"][0]["attributes"]
+        assert gltf["accessors"][attributes["POSITION"]]["componentType"] == 5126
+        skin = gltf["skins"][node["skin"]]
+        assert skin["joints"] == [1, 2]
+        inverseBindMatrices = read_accessor(gltf, binary, skin["inverseBindMatrices"]).reshape(-1, 4, 4).transpose(0, 2, 1)
+        # in the rest pose every joint puts the mesh back where its node had it
+        for (joint, inverseBindMatrix) in zip(skin["joints"], inverseBindMatrices):
+            assert np.allclose(world[joint] @ inverseBindMatrix, world[nodeIndex], atol=1e-5)
+
+
+def test_animation_channels(make_pod, tmp_path):
+    pod_path = make_pod("animated.pod", num_frames=5, matrix=True)
+    (gltf, binary) = convert(pod_path, str(tmp_path / "animated.glb"))
+    (animation,) = gltf["animations"]
+    # the matrices turn about z and move along x, scale never changes
+    paths = sorted({channel["target"]["path"] for channel in animation["channels"]})
+    assert paths == ["rotation", "translation"]
+    for channel in animation["channels"]:
+        sampler = animation["samplers"][channel["sampler"]]
+        times = read_accessor(gltf, binary, sampler["input"])[:, 0]
+        values = read_accessor(gltf, binary, sampler["output"])
+        assert times[0] == 0 and np.all(np.diff(times) > 0)
+        if channel["target"]["path"] == "translation":
+            assert np.allclose(values[-1], [2, 1, 2])
+        else:
+            assert np.allclose(np.abs(values[-1]), [0, 0, np.sin(0.2), np.cos(0.2)], atol=1e-6)
+
+
+def test_texture_outputs_are_not_converted_twice(tmp_path, monkeypatch):
+    # PNGs are named after the .pvr alone, so same-named textures in
+    # different subdirectories must not be converted concurrently
+    source = tmp_path / "model"
+    for name in ("a/x.pvr", "b/x.pvr", "y.pvr"):
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(b"")
+    converted = []
+    monkeypatch.setattr(pod2glb, "xmlroot", object())
+    monkeypatch.setattr(pod2glb, "pathto", str(source / "model.pod"))
+    monkeypatch.setattr(pod2glb, "pathout", str(tmp_path / "out" / "model.glb"))
+    cache = pod2glb.TextureCache(str(tmp_path / "cache"), 0)
+    evictions = []
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(True))
+    monkeypatch.setattr(pod2glb, "texturecache", cache)
+    monkeypatch.setattr(pod2glb.POD2GLB, "use_builtin_decoder", staticmethod(lambda: True))
+    monkeypatch.setattr(pod2glb.POD2GLB, "convert_texture_single", staticmethod(lambda tool_path, input_file, output: converted.append(output)))
+
+    pod2glb.POD2GLB().convert_textures()
+    assert sorted(os.path.basename(output) for output in converted) == ["x.png", "y.png"]
+    # the cache is only scanned once per run, by main()
+    assert not evictions
+
+
+def test_texture_cache_evicts_least_recently_used(tmp_path):
+    cache = pod2glb.TextureCache(str(tmp_path / "cache"), 250)
+    output = tmp_path / "texture.png"
+    for (age, key) in enumerate(["cc", "aa", "bb"]):
+        output.write_bytes(bytes(100))
+        cache.store(key * 32, str(output))
+        os.utime(cache.entry_path(key * 32), (1000 + age, 1000 + age))
+    assert cache.fetch("aa" * 32, str(tmp_path / "fetched.png"))
+
+    cache.evict()
+    assert not os.path.exists(cache.entry_path("cc" * 32))
+    assert os.path.exists(cache.entry_path("aa" * 32))
+    assert os.path.exists(cache.entry_path("bb" * 32))
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("texture2ddecoder")
+
+from PowerVR.pvr2image import convert_bgra_to_rgba
+
+
+def test_convert_bgra_to_rgba():
+    data = bytes(range(16))
+    expected = bytes((2, 1, 0, 3, 6, 5, 4, 7, 10, 9, 8, 11, 14, 13, 12, 15))
+    assert bytes(convert_bgra_to_rgba(data, 2, 2)) == expected
+    # a larger reused buffer only has its first width * height * 4 bytes written
+    out = bytearray(b"\xff" * 20)
+    assert convert_bgra_to_rgba(data, 2, 2, out) is out
+    assert out == expected + b"\xff" * 4
+
+
+@pytest.mark.parametrize("out", [bytearray(15), bytes(16), memoryview(bytearray(16)).toreadonly()])
+def test_convert_bgra_to_rgba_rejects_bad_output(out):
+    with pytest.raises(ValueError):
+        convert_bgra_to_rgba(bytes(16), 2, 2, out)
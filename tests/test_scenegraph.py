@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from PowerVR.PVRModel import PVRModel
+from PowerVR.PVRNode import PVRNode
+from PowerVR.PVRPODLoader import PVRPODLoader
+
+
+def make_nodes(parents, indices=None):
+    nodes = []
+    for (nodeIndex, parent) in enumerate(parents):
+        node = PVRNode()
+        node.parentIndex = parent
+        node.index = nodeIndex if indices is None else indices[nodeIndex]
+        nodes.append(node)
+    return nodes
+
+
+def make_model(parents, numMeshNodes=None, indices=None):
+    model = PVRModel()
+    model.nodes = make_nodes(parents, indices)
+    model.numNodes = len(parents)
+    model.numMeshNodes = len(parents) if numMeshNodes is None else numMeshNodes
+    return model
+
+
+def depths(parents):
+    # brute force: depth of every node, None if it never reaches a root
+    result = []
+    for nodeIndex in range(len(parents)):
+        depth = 0
+        seen = set()
+        while 0 <= parents[nodeIndex] < len(parents) and nodeIndex not in seen:
+            seen.add(nodeIndex)
+            nodeIndex = parents[nodeIndex]
+            depth += 1
+        result.append(None if nodeIndex in seen else depth)
+    return result
+
+
+def test_random_forest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    count = 2000
+    # parents come before their children, with a few malformed indices
+    parents = [-1 if i == 0 or rng.random() < 0.02 else int(rng.integers(0, i)) for i in range(count)]
+    parents[10] = count + 5
+    parents[20] = -7
+    graph = make_model(parents).BuildSceneGraph()
+
+    for nodeIndex in range(count):
+        expected = [child for child in range(count) if parents[child] == nodeIndex]
+        assert graph.Children(nodeIndex).tolist() == expected
+    assert graph.roots.tolist() == [i for (i, parent) in enumerate(parents) if not 0 <= parent < count]
+
+    nodeDepths = depths(parents)
+    assert sorted(graph.order.tolist()) == list(range(count))
+    for (depth, level) in enumerate(graph.Levels()):
+        assert all(nodeDepths[nodeIndex] == depth for nodeIndex in level.tolist())
+    assert graph.levelOffsets[-1] == count
+
+    nodes = rng.choice(count, size=50, replace=False)
+    assert graph.ChildrenOf(nodes).tolist() == [child for nodeIndex in nodes for child in graph.Children(nodeIndex).tolist()]
+
+
+def test_cycles_come_last():
+    parents = [-1, 0, 3, 2, 3]
+    graph = make_model(parents).BuildSceneGraph()
+    assert graph.roots.tolist() == [0]
+    assert [level.tolist() for level in graph.Levels()] == [[0], [1]]
+    assert graph.order.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_mesh_indices_only_for_mesh_nodes():
+    # two mesh nodes (one without a mesh), then a light and a camera node
+    # whose index is a light or camera index
+    model = make_model([-1, 0, 0, 0], numMeshNodes=2, indices=[-1, 0, 0, 1])
+    assert model.BuildSceneGraph().meshIndices.tolist() == [-1, 0, -1, -1]
+    # without the mesh node count every index is taken as it is
+    model.numMeshNodes = None
+    assert model.BuildSceneGraph().meshIndices.tolist() == [-1, 0, 0, 1]
+
+
+def test_graph_follows_node_changes():
+    model = make_model([-1, 0])
+    assert model.BuildSceneGraph().roots.tolist() == [0]
+    model.nodes[1].parentIndex = -1
+    assert model.BuildSceneGraph().roots.tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("root_parent", [-1, 99, -5])
+def test_malformed_parents_become_scene_roots(make_pod, tmp_path, root_parent):
+    from test_pod2glb import convert
+
+    pod_path = make_pod("model.pod", root_parent=root_parent)
+    (gltf, binary) = convert(pod_path, str(tmp_path / "model.glb"))
+    assert gltf["scenes"][0]["nodes"] == [2]
+    assert gltf["nodes"][2]["children"] == [0, 1]
+    with PVRPODLoader.open(pod_path) as loader:
+        assert loader.scene.BuildSceneGraph().roots.tolist() == [2]
+
+
+@pytest.mark.parametrize("mesh_node_count", [True, False])
+def test_meshes_without_mesh_node_count(make_pod, tmp_path, mesh_node_count):
+    from test_pod2glb import convert
+
+    pod_path = make_pod("model.pod", mesh_node_count=mesh_node_count)
+    with PVRPODLoader.open(pod_path) as loader:
+        assert loader.scene.numMeshNodes == (2 if mesh_node_count else None)
+    (gltf, binary) = convert(pod_path, str(tmp_path / "model.glb"))
+    assert [node.get("mesh") for node in gltf["nodes"]] == [0, 1, None]